@@ -0,0 +1,134 @@
+"""
+Benchmark: segmented download throughput versus fragment concurrency.
+
+Serves an HLS playlist from a local HTTP server that simulates a high-latency
+link: every request waits --latency seconds before the first byte, and each
+connection is capped at --connection-kbps. The playlist is then downloaded
+through the download queue once per concurrency level, and the script reports:
+
+    seconds   wall time of the download
+    MB/s      payload throughput
+    speedup   relative to fetching one fragment at a time
+
+Usage:
+    python benchmarks/bench_fragments.py [--segments 40] [--segment-kb 512]
+                                         [--latency 0.15] [--connection-kbps 16000]
+                                         [--concurrency 1 2 4 8]
+
+Needs no network access or ffmpeg.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import download_queue  # noqa: E402
+
+WRITE_BLOCK = 16 * 1024  # Bytes the server sends between throttling sleeps
+
+
+def make_handler(segments, segment_bytes, latency, connection_kbps):
+    """Builds a request handler serving an HLS playlist of ``segments`` fragments."""
+    payload = os.urandom(segment_bytes)
+    playlist = "\n".join(
+        ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4", "#EXT-X-MEDIA-SEQUENCE:0"]
+        + [f"#EXTINF:4.0,\nseg{index}.ts" for index in range(segments)]
+        + ["#EXT-X-ENDLIST", ""]
+    ).encode()
+    bytes_per_second = connection_kbps * 1000 / 8
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            if self.path.endswith(".m3u8"):
+                body, content_type = playlist, "application/vnd.apple.mpegurl"
+            elif self.path.startswith("/seg") and self.path.endswith(".ts"):
+                body, content_type = payload, "video/mp2t"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            started = time.perf_counter()
+            for offset in range(0, len(body), WRITE_BLOCK):
+                self.wfile.write(body[offset:offset + WRITE_BLOCK])
+                # Sleep until this connection is back under its bandwidth cap
+                ahead = (offset + WRITE_BLOCK) / bytes_per_second - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    return Handler
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # yt-dlp dropping idle keep-alive connections is expected
+
+
+def time_download(url, directory, concurrency):
+    """Downloads ``url`` with ``concurrency`` fragments at once; returns (seconds, bytes)."""
+    download_queue.FRAGMENT_OPTIONS["concurrent_fragment_downloads"] = concurrency
+    job = download_queue.make_job(url, "best", directory, title=f"bench x{concurrency}", video_id="bench")
+    started = time.perf_counter()
+    download_queue.download_job(job, archive=False)
+    seconds = time.perf_counter() - started
+    if job["state"] != "done":
+        raise RuntimeError(f"download failed: {job['error']}")
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+    return seconds, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--segments", type=int, default=40, help="fragments in the playlist (default 40)")
+    parser.add_argument("--segment-kb", type=int, default=512, help="size of each fragment (default 512)")
+    parser.add_argument("--latency", type=float, default=0.15, help="seconds before each response (default 0.15)")
+    parser.add_argument(
+        "--connection-kbps", type=int, default=16000, help="bandwidth cap per connection in kbit/s (default 16000)"
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8], help="levels to compare")
+    args = parser.parse_args()
+
+    handler = make_handler(args.segments, args.segment_kb * 1024, args.latency, args.connection_kbps)
+    server = QuietServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/index.m3u8"
+    expected = args.segments * args.segment_kb * 1024
+
+    print(
+        f"{args.segments} fragments x {args.segment_kb} KB, {args.latency * 1000:.0f} ms latency, "
+        f"{args.connection_kbps} kbit/s per connection"
+    )
+    print(f"{'fragments at once':>18} {'seconds':>8} {'MB/s':>7} {'speedup':>8}")
+    scratch = tempfile.mkdtemp(prefix="bench_fragments_")
+    baseline = None
+    try:
+        for concurrency in args.concurrency:
+            directory = os.path.join(scratch, str(concurrency))
+            seconds, size = time_download(url, directory, concurrency)
+            if size != expected:
+                print(f"warning: downloaded {size} bytes, expected {expected}")
+            baseline = baseline or seconds
+            print(f"{concurrency:>18} {seconds:8.2f} {size / seconds / 1e6:7.2f} {baseline / seconds:7.2f}x")
+    finally:
+        server.shutdown()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
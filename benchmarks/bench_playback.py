@@ -0,0 +1,215 @@
+"""
+Benchmark: headless playback responsiveness of the audio players.
+
+Drives play_song, play_playlist and play_saved_playlist_enhanced against a fake
+libvlc and a stub yt-dlp with configurable extraction latency, scripting the
+user's keystrokes, and reports:
+
+    TTFA      time from calling the player to the first audible track
+    next/prev time from the N / P command to audio of the new track
+    gap       silence between a track ending and the next one becoming audible
+    CPU/min   CPU seconds the process uses per minute of playback
+
+Each player runs twice in one scratch directory: "cold" with empty caches and
+"warm" with the stream, playlist and audio caches left by the first run.
+
+Usage:
+    python benchmarks/bench_playback.py [--latency 0.8] [--track-seconds 3]
+                                        [--buffer-ms 300] [--tracks 5]
+
+Needs no network access, VLC or audio device.
+"""
+import argparse
+import builtins
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+import audio_cache  # noqa: E402
+import audio_player  # noqa: E402
+import player_controller  # noqa: E402
+import player_engine  # noqa: E402
+import song_save  # noqa: E402
+import stream_cache  # noqa: E402
+import ydl_pool  # noqa: E402
+from fake_backends import Recorder, make_fake_vlc, make_stub_borrow  # noqa: E402
+
+PLAYLIST_ID = "PLbenchmark"
+DWELL_SECONDS = 1.0  # How long the scripted user listens before pressing N or P
+
+
+def video_ids(count):
+    """Returns ``count`` distinct 11-character video IDs."""
+    return [f"bench{number:06d}" for number in range(count)]
+
+
+class ScriptedReader:
+    """
+    Stands in for console_input.CommandReader and types keys on a schedule.
+
+    Each key is pressed DWELL_SECONDS after the previous one took effect; after
+    the last one the remaining tracks advance on their own.
+    """
+
+    def __init__(self, recorder, marks, keys, on_line):
+        self.recorder = recorder
+        self.marks = marks
+        self.keys = keys
+        self.on_line = on_line
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        started = len(self.recorder.audio_starts)
+        for command in self.keys:
+            self.recorder.wait_audio(started + 1)
+            if self._stop.wait(DWELL_SECONDS):
+                return
+            started = len(self.recorder.audio_starts)
+            self.marks.append((command, time.perf_counter(), started + 1))
+            self.on_line(command)
+
+
+class Scenario:
+    """Installs the fake backends and collects the measurements of one run."""
+
+    def __init__(self, args, keys):
+        self.args = args
+        self.keys = keys
+        self.recorder = Recorder()
+        self.marks = []  # (command, timestamp, audio start number it should produce)
+
+    def install(self):
+        """Points the players at the fake backends, keeping on-disk caches."""
+        player_engine._engine = None
+        stream_cache._entries = None
+        audio_cache._index = None
+        sys.modules["vlc"] = make_fake_vlc(self.recorder, self.args.track_seconds, self.args.buffer_ms / 1000.0)
+        ydl_pool.borrow = make_stub_borrow(self.args.latency, {PLAYLIST_ID: video_ids(self.args.tracks)})
+        player_controller.CommandReader = lambda on_line, keystrokes=False: ScriptedReader(
+            self.recorder, self.marks, self.keys, on_line
+        )
+
+    def fake_input(self, prompt=""):
+        """Declines the "play again?" question."""
+        return "n"
+
+    def run(self, play):
+        """Calls ``play`` with stdout silenced and returns the collected metrics."""
+        self.install()
+        real_input = builtins.input
+        builtins.input = self.fake_input
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                play()
+        finally:
+            builtins.input = real_input
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        return self.metrics(start, wall, cpu)
+
+    def metrics(self, start, wall, cpu):
+        starts = [stamp for stamp, _ in self.recorder.audio_starts]
+        result = {
+            "ttfa": starts[0] - start if starts else None,
+            "next": None,
+            "prev": None,
+            "gaps": [],
+            "cpu_per_min": cpu / wall * 60 if wall else None,
+        }
+        for command, stamp, number in self.marks:
+            if command in ("n", "p") and len(starts) >= number:
+                result["next" if command == "n" else "prev"] = starts[number - 1] - stamp
+        for ended, _ in self.recorder.ends:
+            following = [stamp for stamp in starts if stamp >= ended]
+            if following:
+                result["gaps"].append(following[0] - ended)
+        return result
+
+
+def wait_for_background_downloads():
+    """Lets the audio cache finish what the cold run queued."""
+    while audio_cache._pending:
+        time.sleep(0.05)
+
+
+def scenarios(args):
+    """Returns (name, play callable, scripted keys) for each player under test."""
+    urls = [f"https://youtu.be/{video_id}" for video_id in video_ids(args.tracks)]
+    songs = [{"name": f"Video {number}", "url": url} for number, url in enumerate(urls)]
+    return [
+        ("play_song", lambda: audio_player.play_song(urls[0]), ("q",)),
+        (
+            "play_playlist",
+            lambda: audio_player.play_playlist(f"https://www.youtube.com/playlist?list={PLAYLIST_ID}"),
+            ("n", "p"),
+        ),
+        ("saved playlist", lambda: song_save.play_saved_playlist_enhanced("Benchmark", songs), ("n", "p")),
+    ]
+
+
+def milliseconds(value):
+    return "-" if value is None else f"{value * 1000:.0f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.8, help="seconds per stub extraction (default 0.8)")
+    parser.add_argument("--track-seconds", type=float, default=3.0, help="length of each fake track (default 3)")
+    parser.add_argument("--buffer-ms", type=float, default=300, help="fake stream buffering time (default 300)")
+    parser.add_argument("--tracks", type=int, default=5, help="tracks per playlist (default 5)")
+    args = parser.parse_args()
+    if args.track_seconds <= DWELL_SECONDS + 0.5:
+        parser.error(f"--track-seconds must be longer than {DWELL_SECONDS + 0.5}")
+
+    print(
+        f"latency={args.latency}s  track={args.track_seconds}s  "
+        f"buffer={args.buffer_ms:.0f}ms  tracks={args.tracks}"
+    )
+    print(f"{'player':<16}{'cache':<7}{'TTFA':>9}{'next':>9}{'prev':>9}{'gap avg':>10}{'gap max':>10}{'CPU/min':>10}")
+    for name, play, keys in scenarios(args):
+        with tempfile.TemporaryDirectory() as scratch:
+            previous = os.getcwd()
+            os.chdir(scratch)
+            try:
+                for cache in ("cold", "warm"):
+                    result = Scenario(args, keys).run(play)
+                    wait_for_background_downloads()
+                    gaps = result["gaps"]
+                    print(
+                        f"{name:<16}{cache:<7}"
+                        f"{milliseconds(result['ttfa']):>9}"
+                        f"{milliseconds(result['next']):>9}"
+                        f"{milliseconds(result['prev']):>9}"
+                        f"{milliseconds(statistics.mean(gaps) if gaps else None):>10}"
+                        f"{milliseconds(max(gaps) if gaps else None):>10}"
+                        f"{result['cpu_per_min']:>8.2f} s"
+                    )
+            finally:
+                os.chdir(previous)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: per-call yt-dlp extraction latency with a fresh YoutubeDL per call
+(the old behaviour) versus sessions borrowed from ydl_pool.
+
+Usage:
+    python benchmarks/bench_ydl_pool.py [--runs 5] [URL ...]
+
+Needs network access; each run performs a real extraction.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import yt_dlp  # noqa: E402
+import ydl_pool  # noqa: E402
+
+DEFAULT_URLS = [
+    "https://youtu.be/kyjg5kX4pT0",
+    "https://youtu.be/XO8wew38VM8",
+    "https://youtu.be/VCNLZflKQ7o",
+]
+OPTIONS = {
+    "format": "bestaudio/best",
+    "quiet": True,
+    "no_warnings": True,
+}
+
+
+def time_fresh(url):
+    """Extracts ``url`` with a brand-new YoutubeDL session and returns seconds taken."""
+    start = time.perf_counter()
+    with yt_dlp.YoutubeDL(dict(OPTIONS)) as ydl:
+        ydl.extract_info(url, download=False)
+    return time.perf_counter() - start
+
+
+def time_pooled(url):
+    """Extracts ``url`` with a session borrowed from the pool and returns seconds taken."""
+    start = time.perf_counter()
+    with ydl_pool.borrow(OPTIONS) as ydl:
+        ydl.extract_info(url, download=False)
+    return time.perf_counter() - start
+
+
+def report(label, samples):
+    """Prints summary statistics for a list of latencies in seconds."""
+    print(
+        f"{label:<8} runs={len(samples):<3} "
+        f"mean={statistics.mean(samples) * 1000:8.1f} ms  "
+        f"median={statistics.median(samples) * 1000:8.1f} ms  "
+        f"min={min(samples) * 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("urls", nargs="*", default=DEFAULT_URLS, help="video URLs to extract")
+    parser.add_argument("--runs", type=int, default=5, help="passes over the URL list")
+    args = parser.parse_args()
+
+    # Warm the pool once so the pooled numbers show steady-state reuse
+    time_pooled(args.urls[0])
+
+    fresh, pooled = [], []
+    for _ in range(args.runs):
+        for url in args.urls:
+            fresh.append(time_fresh(url))
+            pooled.append(time_pooled(url))
+
+    report("fresh", fresh)
+    report("pooled", pooled)
+    print(f"speedup  {statistics.mean(fresh) / statistics.mean(pooled):.2f}x (mean)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Fake libvlc and yt-dlp backends for headless playback benchmarks.
+
+FakeVLC mimics the parts of python-vlc the player engine uses and records when
+audio actually becomes audible. StubYoutubeDL answers extractions after a
+configurable delay. Neither touches the network or an audio device.
+"""
+import os
+import threading
+import time
+import types
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+TICK_SECONDS = 0.25  # How often the fake player reports MediaPlayerTimeChanged
+
+
+class Recorder:
+    """Thread-safe log of audible starts and track ends."""
+
+    def __init__(self):
+        self.audio_starts = []  # (timestamp, mrl)
+        self.ends = []  # (timestamp, mrl)
+        self._changed = threading.Condition()
+
+    def audio_started(self, mrl):
+        with self._changed:
+            self.audio_starts.append((time.perf_counter(), mrl))
+            self._changed.notify_all()
+
+    def ended(self, mrl):
+        with self._changed:
+            self.ends.append((time.perf_counter(), mrl))
+            self._changed.notify_all()
+
+    def wait_audio(self, count, timeout=60):
+        """Blocks until ``count`` audible starts have happened; returns the last timestamp."""
+        with self._changed:
+            if not self._changed.wait_for(lambda: len(self.audio_starts) >= count, timeout):
+                raise TimeoutError(f"only {len(self.audio_starts)} of {count} tracks started")
+            return self.audio_starts[count - 1][0]
+
+
+class _Event:
+    def __init__(self, kind, **values):
+        self.type = kind
+        self.u = types.SimpleNamespace(**values)
+
+
+class _EventManager:
+    def __init__(self):
+        self._callbacks = {}
+
+    def event_attach(self, kind, callback, *args):
+        self._callbacks.setdefault(kind, []).append((callback, args))
+
+    def fire(self, kind, **values):
+        for callback, args in list(self._callbacks.get(kind, [])):
+            callback(_Event(kind, **values), *args)
+
+
+class _Media:
+    def __init__(self, mrl, *options):
+        self.mrl = mrl
+        self.options = list(options)
+
+    def add_option(self, option):
+        self.options.append(option)
+
+    def release(self):
+        pass
+
+
+def make_fake_vlc(recorder, track_seconds, buffer_seconds):
+    """
+    Builds a module object that stands in for ``vlc``.
+
+    Args:
+        recorder (Recorder): Receives audible starts and track ends.
+        track_seconds (float): Length of every fake track.
+        buffer_seconds (float): Time a network stream needs before it is
+            audible; local files start immediately.
+
+    Returns:
+        module: The fake vlc module.
+    """
+    vlc = types.ModuleType("vlc")
+    vlc.EventType = types.SimpleNamespace(
+        MediaPlayerEndReached="end",
+        MediaPlayerEncounteredError="error",
+        MediaPlayerLengthChanged="length",
+        MediaPlayerTimeChanged="time",
+        MediaPlayerPaused="paused",
+    )
+
+    class MediaPlayer:
+        def __init__(self):
+            self.events = _EventManager()
+            self.media = None
+            self.state = "stopped"
+            self.position = 0.0
+            self._token = None
+
+        def event_manager(self):
+            return self.events
+
+        def set_media(self, media):
+            self.stop()
+            self.media = media
+
+        def audio_set_volume(self, volume):
+            pass
+
+        def play(self):
+            if self.state == "paused":
+                self.state = "playing"
+                recorder.audio_started(self.media.mrl)
+                return 0
+            self.stop()
+            self.state = "opening"
+            self.position = 0.0
+            self._token = object()
+            threading.Thread(target=self._run, args=(self._token,), daemon=True).start()
+            return 0
+
+        def _run(self, token):
+            is_stream = urlparse(self.media.mrl).scheme in ("http", "https")
+            time.sleep(buffer_seconds if is_stream else 0)
+            if self._token is not token:
+                return
+            self.events.fire("length", new_length=int(track_seconds * 1000))
+            if ":start-paused" in self.media.options:
+                self.state = "paused"
+                self.events.fire("paused")
+            else:
+                self.state = "playing"
+                recorder.audio_started(self.media.mrl)
+            while self._token is token:
+                time.sleep(TICK_SECONDS)
+                if self._token is not token or self.state != "playing":
+                    continue
+                self.position += TICK_SECONDS
+                if self.position >= track_seconds:
+                    self.state = "ended"
+                    self._token = None
+                    recorder.ended(self.media.mrl)
+                    self.events.fire("end")
+                    return
+                self.events.fire("time", new_time=int(self.position * 1000))
+
+        def pause(self):
+            if self.state == "playing":
+                self.state = "paused"
+            elif self.state == "paused":
+                self.state = "playing"
+
+        def stop(self):
+            self._token = None
+            self.state = "stopped"
+
+        def is_playing(self):
+            return self.state == "playing"
+
+        def get_time(self):
+            return int(self.position * 1000)
+
+        def get_length(self):
+            return int(track_seconds * 1000)
+
+    class Instance:
+        def __init__(self, options=None):
+            self.options = options
+
+        def media_player_new(self):
+            return MediaPlayer()
+
+        def media_new(self, mrl, *options):
+            return _Media(mrl, *options)
+
+    vlc.MediaPlayer = MediaPlayer
+    vlc.Instance = Instance
+    return vlc
+
+
+class StubYoutubeDL:
+    """
+    Answers yt-dlp extractions after a fixed delay.
+
+    Videos resolve to fake googlevideo URLs with a real ``expire=`` parameter;
+    playlists yield flat entries page by page; downloads write a small file.
+
+    Args:
+        options (dict): The yt-dlp options the caller borrowed a session with.
+        latency (float): Seconds each video extraction or playlist page takes.
+        playlists (dict): Playlist ID -> list of video IDs.
+    """
+
+    def __init__(self, options, latency, playlists):
+        self.options = options
+        self.latency = latency
+        self.playlists = playlists
+
+    def extract_info(self, url, download=False, process=True):
+        from utils import extract_playlist_id, extract_video_id
+
+        playlist_id = extract_playlist_id(url)
+        if playlist_id in self.playlists and not extract_video_id(url):
+            time.sleep(self.latency)
+            return {
+                "id": playlist_id,
+                "title": f"Playlist {playlist_id}",
+                "uploader": "Benchmark",
+                "playlist_count": len(self.playlists[playlist_id]),
+                "entries": self._entries(self.playlists[playlist_id]),
+            }
+        time.sleep(self.latency)
+        video_id = extract_video_id(url)
+        info = {
+            "id": video_id,
+            "title": f"Video {video_id}",
+            "url": f"https://fake.googlevideo.com/videoplayback?id={video_id}&expire={int(time.time()) + 21600}",
+        }
+        if download:
+            template = self.options.get("outtmpl", "%(id)s.%(ext)s")
+            path = template.replace("%(id)s", video_id).replace("%(ext)s", "webm")
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(b"\0" * 4096)
+            info["requested_downloads"] = [{"filepath": path}]
+        return info
+
+    def _entries(self, video_ids, page_size=100):
+        for start in range(0, len(video_ids), page_size):
+            if start:
+                time.sleep(self.latency)
+            for video_id in video_ids[start : start + page_size]:
+                yield {"id": video_id, "title": f"Video {video_id}", "duration": 0}
+
+
+def make_stub_borrow(latency, playlists):
+    """Returns a drop-in replacement for ydl_pool.borrow backed by StubYoutubeDL."""
+
+    @contextmanager
+    def borrow(options):
+        yield StubYoutubeDL(options, latency, playlists)
+
+    return borrow
@@ -0,0 +1,250 @@
+"""
+Local audio file cache for saved songs, keyed by YouTube video ID.
+
+Audio is downloaded once into AUDIO_CACHE_DIR and afterwards played straight
+from disk. The cache is bounded in bytes and evicts least-recently-used files; files
+pinned for offline listening are never evicted.
+Downloads land in yt-dlp's ``.part`` files and are only added to the index once
+complete, so an interrupted download never turns into a cache hit.
+"""
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import ydl_pool
+import bandwidth
+from constants import AUDIO_CACHE_DIR, AUDIO_CACHE_INDEX_FILE
+from utils import extract_video_id
+
+# Upper bound for the audio cache on disk
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+CACHE_DOWNLOAD_OPTIONS = {
+    "format": "bestaudio/best",
+    "quiet": True,
+    "no_warnings": True,
+    "noprogress": True,
+    "outtmpl": os.path.join(AUDIO_CACHE_DIR, "%(id)s.%(ext)s"),
+    # Downloads share the bandwidth limit and feed the bandwidth estimate
+    "progress_hooks": [bandwidth.progress_hook],
+}
+
+_lock = threading.Lock()
+_index = None  # video ID -> {"file", "size", "sha256", "last_used", "pinned", "verified"}
+_background = queue.Queue()  # YouTube URLs waiting for a background download
+_pending = set()  # Video IDs queued for a background download
+_worker = None
+
+
+def _file_path(name):
+    """Returns the absolute path of a file in the cache directory."""
+    return os.path.abspath(os.path.join(AUDIO_CACHE_DIR, name))
+
+
+def _load():
+    """Returns the index, reading it and sweeping leftovers on first use."""
+    global _index
+    if _index is None:
+        try:
+            with open(AUDIO_CACHE_INDEX_FILE, "r") as file:
+                _index = json.load(file)
+        except (FileNotFoundError, ValueError):
+            _index = {}
+        # Remove partial downloads and files the index does not know about
+        known = {entry["file"] for entry in _index.values()}
+        known.add(os.path.basename(AUDIO_CACHE_INDEX_FILE))
+        if os.path.isdir(AUDIO_CACHE_DIR):
+            for name in os.listdir(AUDIO_CACHE_DIR):
+                if name not in known:
+                    try:
+                        os.remove(_file_path(name))
+                    except OSError:
+                        pass
+    return _index
+
+
+def _save():
+    """Writes the index to disk atomically."""
+    try:
+        os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+        with open(AUDIO_CACHE_INDEX_FILE + ".tmp", "w") as file:
+            json.dump(_index, file)
+        os.replace(AUDIO_CACHE_INDEX_FILE + ".tmp", AUDIO_CACHE_INDEX_FILE)
+    except OSError:
+        pass
+
+
+def _sha256(path):
+    """Returns the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _drop(video_id):
+    """Removes an entry and its file. Caller holds the lock."""
+    entry = _index.pop(video_id, None)
+    if entry:
+        try:
+            os.remove(_file_path(entry["file"]))
+        except OSError:
+            pass
+
+
+def get_cached_path(video_id, verify=False):
+    """
+    Returns the local audio file for a video if it is cached and intact.
+
+    The file size is always checked against the index. The SHA-256 checksum
+    is checked as well on the first use after a download, for pinned files
+    (which are kept for offline listening and never downloaded again), and
+    when ``verify`` is set. Damaged entries are removed.
+
+    Args:
+        video_id (str): The YouTube video ID.
+        verify (bool): Compare the full checksum as well.
+
+    Returns:
+        str: Absolute path of the cached file, or None on a miss.
+    """
+    if not video_id:
+        return None
+    with _lock:
+        entry = _load().get(video_id)
+        if not entry:
+            return None
+        path = _file_path(entry["file"])
+        try:
+            intact = os.path.getsize(path) == entry["size"]
+            if intact and (verify or entry.get("pinned") or not entry.get("verified")):
+                intact = _sha256(path) == entry["sha256"]
+        except OSError:
+            intact = False
+        if not intact:
+            _drop(video_id)
+            _save()
+            return None
+        entry["verified"] = True
+        entry["last_used"] = time.time()
+        _save()
+        return path
+
+
+def _evict(keep):
+    """Evicts least-recently-used unpinned files until the cache fits. Caller holds the lock."""
+    total = sum(entry["size"] for entry in _index.values())
+    for video_id in sorted(_index, key=lambda key: _index[key]["last_used"]):
+        if total <= AUDIO_CACHE_MAX_BYTES:
+            break
+        if video_id == keep or _index[video_id].get("pinned"):
+            continue
+        total -= _index[video_id]["size"]
+        _drop(video_id)
+
+
+def store_file(video_id, path, pin=False):
+    """
+    Adds a completed audio file in the cache directory to the index.
+
+    Args:
+        video_id (str): The YouTube video ID.
+        path (str): Path of the finished file inside AUDIO_CACHE_DIR.
+        pin (bool): Keep the file out of LRU eviction.
+    """
+    entry = {
+        "file": os.path.basename(path),
+        "size": os.path.getsize(path),
+        "sha256": _sha256(path),
+        "last_used": time.time(),
+        "pinned": pin,
+        "verified": False,
+    }
+    with _lock:
+        _load()[video_id] = entry
+        _evict(keep=video_id)
+        _save()
+
+
+def fetch(youtube_url, pin=False):
+    """
+    Downloads a song's audio into the cache unless it is already there.
+
+    Args:
+        youtube_url (str): The YouTube URL of the song.
+        pin (bool): Keep the file out of LRU eviction (offline listening).
+
+    Returns:
+        str: Path of the cached file, or None if the download failed.
+    """
+    video_id = extract_video_id(youtube_url)
+    path = get_cached_path(video_id)
+    if path:
+        if pin:
+            set_pinned([video_id], True)
+        return path
+    with _lock:
+        _load()  # Sweep leftovers before yt-dlp writes new files
+    os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+    try:
+        with bandwidth.consumer(f"Audio cache: {video_id or youtube_url}"), ydl_pool.borrow(CACHE_DOWNLOAD_OPTIONS) as ydl:
+            info = ydl.extract_info(youtube_url, download=True)
+        path = info["requested_downloads"][0]["filepath"]
+        store_file(video_id or info["id"], path, pin)
+        return _file_path(os.path.basename(path))
+    except Exception:
+        return None
+
+
+def set_pinned(video_ids, pinned):
+    """
+    Pins cached files for offline listening, or releases them to LRU eviction.
+
+    Args:
+        video_ids (iterable): YouTube video IDs.
+        pinned (bool): True to pin, False to release.
+    """
+    with _lock:
+        index = _load()
+        for video_id in video_ids:
+            if video_id in index:
+                index[video_id]["pinned"] = pinned
+        if not pinned:
+            _evict(keep=None)
+        _save()
+
+
+def _background_worker():
+    """Downloads queued songs one at a time (daemon thread, so it never blocks exit)."""
+    while True:
+        youtube_url = _background.get()
+        try:
+            fetch(youtube_url)
+        finally:
+            with _lock:
+                _pending.discard(extract_video_id(youtube_url))
+
+
+def cache_in_background(youtube_url):
+    """
+    Queues a song for download into the cache on a background worker, unless
+    it is cached or queued already.
+
+    Args:
+        youtube_url (str): The YouTube URL of the song.
+    """
+    global _worker
+    video_id = extract_video_id(youtube_url)
+    if not video_id:
+        return
+    with _lock:
+        if video_id in _pending or video_id in _load():
+            return
+        _pending.add(video_id)
+        if _worker is None:
+            _worker = threading.Thread(target=_background_worker, name="audio-cache", daemon=True)
+            _worker.start()
+    _background.put(youtube_url)
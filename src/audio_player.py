@@ -1,62 +1,121 @@
 import os
 import re
 import time
-import yt_dlp
-from functools import lru_cache
+import asyncio
+import ydl_pool
+import stream_cache
+import resolution_policy
+import stream_quality
+import audio_cache
+import info_cache
+from functools import partial
+from playlist_stream import PlaylistStream
+from player_controller import PlayerController
+from player_engine import get_engine, GAPLESS_PLAYBACK, CROSSFADE_SECONDS
 from termcolor import colored
-from utils import clear_screen
+from utils import clear_screen, extract_video_id
 
-# Check if VLC is available (will be checked when needed)
-VLC_AVAILABLE = False
+# Function to extract the audio URL of a YouTube video once
+def extract_audio_url(youtube_url, format_selector="bestaudio/best"):
+    """
+    Runs one yt-dlp extraction for the audio stream of a video.
+    If the info cache holds the video with valid stream URLs, only the format
+    selection runs; otherwise the extracted information is added to the cache.
+
+    Args:
+        youtube_url (str): The URL of the YouTube video.
+        format_selector (str): yt-dlp format string choosing the audio stream.
+
+    Returns:
+        tuple: (video ID, direct audio URL).
+    """
+    # Options for yt_dlp to extract audio URL
+    ydl_opts = {
+        "format": format_selector,  # Best audio, or the best under the streaming bitrate cap
+        "quiet": True,  # Suppress verbose output
+        "no_warnings": True,  # Suppress warnings
+        "extract_flat": True,  # Extract metadata without downloading
+    }
+    cached = info_cache.get(extract_video_id(youtube_url))
+    with ydl_pool.borrow(ydl_opts) as ydl:
+        if cached is not None:
+            info = ydl.process_ie_result(cached, download=False)
+        else:
+            info = ydl.extract_info(youtube_url, download=False)
+            info_cache.store(info)
+        return info.get("id"), info["url"]
 
 
 # Function to fetch the audio URL of a YouTube video
-@lru_cache(maxsize=128) # Cache up to 128 most recent URLs
-def get_audio_url(youtube_url):
+def get_audio_url(youtube_url, quiet=False):
     """
     Fetches the direct audio URL of a YouTube video.
-    Uses lru_cache to store recently fetched URLs to improve performance on repeated requests.
+    Resolved URLs are kept in the on-disk stream cache until shortly before they
+    expire, so replaying a song skips the yt-dlp extraction. The audio format
+    follows the streaming quality setting and measured bandwidth. Extraction runs
+    under the resolution policy: transient errors are retried with backoff,
+    dead videos are not tried again for a while and repeated failures pause
+    extraction altogether.
 
     Args:
         youtube_url (str): The URL of the YouTube video.
+        quiet (bool): Suppress progress and error messages (used for background prefetch).
     Returns:
         str: The direct audio URL, or None if fetching fails.
     """
+    video_id = extract_video_id(youtube_url)
+    cap = stream_quality.current_cap()
+    profile = stream_quality.profile_name(cap)
+    if video_id:
+        cached_url = stream_cache.get_cached_url(video_id, profile)
+        if cached_url:
+            return cached_url
     try:
-        print(colored("\nFetching Audio...", "cyan"))
-        print(colored("\nWait a second (Depend on your internet)...\n", "yellow"))
-        # Options for yt_dlp to extract audio URL
-        ydl_opts = {
-            "format": "bestaudio/best",  # Fetch the best quality audio
-            "quiet": True,  # Suppress verbose output
-            "no_warnings": True,  # Suppress warnings
-            "extract_flat": True,  # Extract metadata without downloading
-        }
-        # Extract audio stream URL
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(youtube_url, download=False)
-            return info["url"]
-    except yt_dlp.DownloadError as e:
-        print(colored(f"Download error: {e}", "red"))
-        print(colored("Check if the URL is valid and accessible.", "yellow"))
-    except KeyError as e:
-        print(colored(f"KeyError: Missing expected data in the response. {e}", "red"))
-        print(
-            colored(
-                "Could not extract the audio URL. Please try again later.", "yellow"
-            )
+        if not quiet:
+            print(colored("\nFetching Audio...", "cyan"))
+            print(colored("\nWait a second (Depend on your internet)...\n", "yellow"))
+        info_id, audio_url = resolution_policy.resolve(
+            video_id, partial(extract_audio_url, youtube_url, stream_quality.format_selector(cap))
         )
-    except Exception as e:
-        print(colored(f"Failed to fetch audio URL. Error: {e}", "red"))
-        print(colored("Wait for 2 seconds and try again...", "yellow"))
-    time.sleep(2)
+        stream_cache.store_url(video_id or info_id, audio_url, profile)
+        return audio_url
+    except resolution_policy.ResolutionError as e:
+        if quiet:
+            return None
+        if e.kind == "permanent":
+            print(colored(f"This video cannot be played: {e}", "red"))
+            print(colored("Check if the URL is valid and accessible.", "yellow"))
+        elif e.kind == "circuit_open":
+            print(colored(f"Not fetching audio right now: {e}.", "red"))
+        else:
+            print(colored(f"Failed to fetch audio URL. Error: {e}", "red"))
+            print(colored("Check your internet connection and try again.", "yellow"))
     return None
 
 
+# Function to pick the local cached file or the stream URL for a song
+def get_playable_source(youtube_url, quiet=False):
+    """
+    Returns what the player should open for a song: the local file from the
+    audio cache if the song is cached, otherwise its stream URL.
+
+    Args:
+        youtube_url (str): The URL of the YouTube video.
+        quiet (bool): Suppress progress and error messages.
+    Returns:
+        str: A local file path or stream URL, or None if fetching fails.
+    """
+    local_path = audio_cache.get_cached_path(extract_video_id(youtube_url))
+    if local_path:
+        return local_path
+    return get_audio_url(youtube_url, quiet)
+
+
 # Function to get playlist information
 def get_playlist_info(playlist_url):
     """
-    Fetches information about a YouTube playlist.
+    Fetches information about a YouTube playlist, waiting for every entry.
+    Playback uses PlaylistStream directly so it can start on the first page.
     
     Args:
         playlist_url (str): The YouTube playlist URL.
@@ -64,220 +123,92 @@ def get_playlist_info(playlist_url):
     Returns:
         dict: Playlist information including title and list of video URLs, or None if fetching fails.
     """
-    try:
-        print(colored("\nFetching playlist information...", "cyan"))
-        print(colored("This may take a moment for large playlists...\n", "yellow"))
-        
-        ydl_opts = {
-            "quiet": True,
-            "no_warnings": True,  # Suppress warnings
-            "extract_flat": True,  # Extract metadata without downloading
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(playlist_url, download=False)
-            
-            playlist_info = {
-                "title": info.get("title", "Unknown Playlist"),
-                "uploader": info.get("uploader", "Unknown"),
-                "videos": []
-            }
-            
-            # Extract video information from the playlist
-            for entry in info.get("entries", []):
-                if entry and "id" in entry:
-                    video_url = f"https://youtu.be/{entry['id']}"
-                    video_info = {
-                        "title": entry.get("title", "Unknown Title"),
-                        "url": video_url,
-                        "duration": entry.get("duration", 0)
-                    }
-                    playlist_info["videos"].append(video_info)
-            
-            return playlist_info
-            
-    except Exception as e:
-        print(colored(f"Failed to fetch playlist information: {e}", "red"))
+    print(colored("\nFetching playlist information...", "cyan"))
+    print(colored("This may take a moment for large playlists...\n", "yellow"))
+
+    videos = PlaylistStream(playlist_url)
+    if not videos.start():
+        print(colored(f"Failed to fetch playlist information: {videos.error}", "red"))
         print(colored("Please check if the playlist URL is valid and accessible.", "yellow"))
         return None
+    videos.wait_complete()
+    return {
+        "title": videos.title,
+        "uploader": videos.uploader,
+        "videos": list(videos[:]),
+    }
 
 
-# Function to get current playback time (in seconds)
-def get_current_time(player):
-    """Get current playback time in seconds."""
-    try:
-        return player.get_time() / 1000.0  # VLC returns time in milliseconds
-    except:
-        return 0
-
+# Function to play a list of tracks with automatic progression and navigation controls
+def play_tracks(tracks, start_index=0, gapless=GAPLESS_PLAYBACK, crossfade=CROSSFADE_SECONDS, cache_audio=False):
+    """
+    Plays a list of tracks, advancing as soon as libvlc reports the end of each one.
 
-# Function to get song duration (in seconds)
-def get_duration(player):
-    """Get current song duration in seconds."""
-    try:
-        return player.get_length() / 1000.0  # VLC returns length in milliseconds
-    except:
-        return 0
+    Keys, player events and track resolution are handled by a PlayerController
+    on an asyncio event loop, which also keeps a live status line up to date.
 
+    Args:
+        tracks (list): Track dictionaries with 'title' and 'url' keys, or a
+            PlaylistStream that is still loading.
+        start_index (int): The index of the track to start playing from.
+        gapless (bool): Preload the next track and hand over without a gap.
+        crossfade (float): Seconds to crossfade between tracks in gapless mode.
+        cache_audio (bool): Store played tracks in the local audio cache.
 
-# Function to play a playlist with automatic progression and navigation controls
+    Returns:
+        bool: True if the end of the list was reached, False if the user exited.
+    """
+    engine = get_engine()
+    if not engine:
+        return False
+
+    controller = PlayerController(
+        engine,
+        tracks,
+        get_playable_source,
+        start_index=start_index,
+        gapless=gapless,
+        crossfade=crossfade,
+        # Only tracks that are actually played go into the cache, not prefetched ones
+        on_play=audio_cache.cache_in_background if cache_audio else None,
+    )
+    print(colored(f"Volume: {engine.volume}%", "cyan"))
+    return asyncio.run(controller.run())
+
+
+# Function to play a YouTube playlist with automatic progression and navigation controls
 def play_playlist(playlist_url, start_index=0):
     """
     Plays a YouTube playlist with automatic next song progression and navigation controls.
+    Playback starts as soon as the first page of the playlist has loaded (or
+    immediately, from the playlist cache); the rest keeps loading in the background.
     
     Args:
         playlist_url (str): The YouTube playlist URL.
         start_index (int): The index of the song to start playing from.
     """
-    # Try to import VLC only when needed
-    try:
-        import vlc
-    except ImportError:
-        print(colored("VLC media player is not available. Cannot play audio.", "red"))
-        print(colored("Please install VLC media player and ensure python-vlc package is properly configured.", "yellow"))
-        time.sleep(3)
-        return
-    
-    # Get playlist information
-    playlist_info = get_playlist_info(playlist_url)
-    if not playlist_info:
+    print(colored("\nFetching playlist information...", "cyan"))
+    videos = PlaylistStream(playlist_url)
+    if not videos.start():
+        print(colored(f"Failed to fetch playlist information: {videos.error}", "red"))
+        print(colored("Please check if the playlist URL is valid and accessible.", "yellow"))
         return
+    if videos.from_cache:
+        print(colored("Using the saved playlist listing; checking YouTube for changes in the background.", "cyan"))
     
-    videos = playlist_info["videos"]
-    if not videos:
+    if not videos.wait_for(0):
         print(colored("No videos found in this playlist.", "red"))
         return
     
-    print(colored(f"\n=== PLAYLIST: {playlist_info['title']} ===", "green"))
-    print(colored(f"Total videos: {len(videos)}", "yellow"))
-    print(colored(f"Playlist by: {playlist_info['uploader']}", "cyan"))
-    
-    current_index = start_index
-    volume = 50
-    auto_next = True  # Automatically play next song when current ends
-    
-    while current_index < len(videos):
-        current_video = videos[current_index]
-        
-        print(colored(f"\n--- Playing {current_index + 1}/{len(videos)}: {current_video['title']} ---", "green"))
-        
-        # Get audio URL for current video
-        audio_url = get_audio_url(current_video['url'])
-        if not audio_url:
-            print(colored(f"Skipping {current_video['title']} - could not fetch audio", "red"))
-            current_index += 1
-            continue
-        
-        try:
-            player = vlc.MediaPlayer(audio_url)
-            player.audio_set_volume(volume)
-            player.play()
-            
-            print(colored(f"Volume: {volume}%", "cyan"))
-            print(colored("Loading next song...", "yellow"))
-            time.sleep(2)  # Give time for the song to start loading
-            
-            # Track if we need to continue to next song
-            playlist_ended = False
-            
-            # Main playlist control loop
-            while not playlist_ended:
-                # Check if song has ended (if auto_next is enabled)
-                if auto_next and get_duration(player) > 0:
-                    current_time = get_current_time(player)
-                    duration = get_duration(player)
-                    
-                    # If we're within 5 seconds of the end, prepare next song
-                    if current_time >= (duration - 5) and current_time < duration:
-                        print(colored("Song almost finished, preparing next song...", "yellow"))
-                        time.sleep(3)
-                        current_index += 1
-                        playlist_ended = True
-                        break
-                
-                # Display playlist-specific controls
-                auto_status = "ON" if auto_next else "OFF"
-                auto_color = "green" if auto_next else "red"
-                print(
-                    colored("\nPlaylist Controls: ", "yellow")
-                    + colored("[N] Next Song | ", "green")
-                    + colored("[P] Previous Song | ", "blue")
-                    + colored("[C] Pause/Resume | ", "cyan")
-                    + colored("[R] Restart Song | ", "magenta")
-                    + colored(f"[A] Auto Next: {auto_status} | ", auto_color)
-                    + colored("[V] Volume +/- | ", "cyan")
-                    + colored("[Q] Exit Playlist", "red")
-                )
-                
-                command = input(colored("Enter command: ", "yellow")).strip().lower()
-                
-                if command == "n":  # Next song
-                    current_index += 1
-                    playlist_ended = True
-                    player.stop()
-                    print(colored("Moving to next song.", "green"))
-                    break
-                    
-                elif command == "p":  # Previous song
-                    if current_index > 0:
-                        current_index -= 1
-                        playlist_ended = True
-                        player.stop()
-                        print(colored("Moving to previous song.", "blue"))
-                        break
-                    else:
-                        print(colored("Already at the first song.", "yellow"))
-                        
-                elif command == "c":  # Pause/Resume
-                    if player.is_playing():
-                        player.pause()
-                        print(colored("Music paused.", "yellow"))
-                    else:
-                        player.play()
-                        print(colored("Music resumed.", "green"))
-                        
-                elif command == "r":  # Restart current song
-                    player.stop()
-                    player.play()
-                    print(colored("Song restarted.", "magenta"))
-                    
-                elif command == "a":  # Toggle auto next
-                    auto_next = not auto_next
-                    if auto_next:
-                        print(colored("Auto next enabled. Will play next song automatically.", "green"))
-                    else:
-                        print(colored("Auto next disabled. You'll need to press N for next song.", "red"))
-                    
-                elif command == "v":  # Volume control
-                    print(colored(f"Current volume: {volume}%", "cyan"))
-                    vol_cmd = input(colored("Enter new volume (0-100) or press Enter to cancel: ", "yellow")).strip()
-                    if vol_cmd.isdigit():
-                        new_vol = int(vol_cmd)
-                        if 0 <= new_vol <= 100:
-                            volume = new_vol
-                            player.audio_set_volume(volume)
-                            print(colored(f"Volume set to {volume}%.", "cyan"))
-                        else:
-                            print(colored("Invalid volume level. Please enter a number between 0 and 100.", "red"))
-                    
-                elif command == "q":  # Exit playlist
-                    player.stop()
-                    print(colored("Exiting playlist.", "red"))
-                    return
-                    
-                else:
-                    print("Invalid command. Try again.")
-                
-                # Small delay to prevent excessive CPU usage
-                time.sleep(0.5)
-                
-        except Exception as e:
-            print(colored(f"Error playing {current_video['title']}: {e}", "red"))
-            current_index += 1
-            continue
+    print(colored(f"\n=== PLAYLIST: {videos.title} ===", "green"))
+    print(colored(f"Total videos: {videos.expected_count or videos.count_label()}", "yellow"))
+    print(colored(f"Playlist by: {videos.uploader}", "cyan"))
     
-    # Playlist finished
-    if current_index >= len(videos):
+    try:
+        completed = play_tracks(videos, start_index)
+    finally:
+        videos.close()  # Stop loading pages nobody will play
+    if completed:
         print(colored("\n=== Playlist completed! ===", "green"))
         play_again = input(colored("Do you want to play the playlist again? (y/n): ", "yellow")).strip().lower()
         if play_again == "y":
@@ -294,82 +225,30 @@ def is_youtube_playlist(url):
 
 
 # Function to play a song with volume control
-def play_song(song):
+def play_song(song, cache_audio=False):
     """
     Plays a song from a given YouTube URL with volume control.
+    Songs in the local audio cache are played from disk. Keys act immediately
+    and a status line shows the playback position while the song plays.
     Args:
         song (str): The YouTube URL of the song to play.
+        cache_audio (bool): Store the song in the local audio cache.
     """
-    # Try to import VLC only when needed
-    try:
-        import vlc
-    except ImportError:
-        print(colored("VLC media player is not available. Cannot play audio.", "red"))
-        print(colored("Please install VLC media player and ensure python-vlc package is properly configured.", "yellow"))
-        time.sleep(3)
+    engine = get_engine()
+    if not engine:
         return
 
     try:
         print(colored("\nStarting the audio...", "green"))
-        url = get_audio_url(song)  # Fetch the audio URL
-        if not url:
-            print(colored("Could not fetch the audio URL. Aborting...", "red"))
-            time.sleep(2)
-            return
-        player = vlc.MediaPlayer(url)  # Create a VLC media player instance
-        player.play()  # Start playback
-
-        # Set an initial volume level
-        volume = 50
-        player.audio_set_volume(volume)
-        print(colored(f"Volume set to {volume}%.", "cyan"))
-
-        # Infinite loop to handle user controls
-        while True:
-            print(
-                colored("\nControls: ", "yellow")
-                + colored("[P] Pause/Resume | ", "cyan")
-                + colored("[R] Restart | ", "green")
-                + colored("[Q] Quit | ", "red")
-                + colored("[+] Increase Volume | ", "magenta")
-                + colored("[-] Decrease Volume", "magenta")
-            )
-            command = input(colored("Enter command: ", "yellow")).strip().lower()
-
-            if command == "p":  # Pause or resume the music
-                if player.is_playing():
-                    player.pause()
-                    print(colored("Music paused.", "yellow"))
-                else:
-                    player.play()
-                    print(colored("Music resumed.", "green"))
-            elif command == "r":  # Restart the song
-                player.stop()
-                player.play()
-                print(colored("Music restarted.", "green"))
-            elif command == "+":  # Increase volume
-                volume = min(100, volume + 10)  # Max volume is 100%
-                player.audio_set_volume(volume)
-                print(colored(f"Volume increased to {volume}%.", "cyan"))
-            elif command == "-":  # Decrease volume
-                volume = max(0, volume - 10)  # Min volume is 0%
-                player.audio_set_volume(volume)
-                print(colored(f"Volume decreased to {volume}%.", "cyan"))
-            elif command == "q":  # Quit the player and return to the main menu
-                player.stop()
-                print(colored("Exiting player.", "red"))
-                break
-            else:
-                # Handle invalid commands
-                print("Invalid command. Try again.")
-    except vlc.MediaPlayerError as e:
-        print(colored(f"VLC MediaPlayer error: {e}", "red"))
-        print(
-            colored(
-                "Could not initialize the media player. Please check the installation and dependencies.",
-                "yellow",
-            )
+        print(colored(f"Volume set to {engine.volume}%.", "cyan"))
+        controller = PlayerController(
+            engine,
+            [{"title": song, "url": song}],
+            get_playable_source,  # Local file or audio URL
+            single=True,
+            on_play=audio_cache.cache_in_background if cache_audio else None,
         )
+        asyncio.run(controller.run())
     except Exception as e:
         print(colored(f"Some error occurred while playing the song. Error: {e}", "red"))
         print(colored("Wait for 2 seconds and try again...", "yellow"))
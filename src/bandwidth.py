@@ -0,0 +1,220 @@
+"""
+Process-wide bandwidth governor for downloads.
+
+Every yt-dlp download (the downloader's job queue and the audio cache) charges
+the bytes it receives to one shared token bucket through progress_hook, and
+the hook blocks long enough to keep the total under the limit. The bucket is
+implemented as a virtual clock (GCRA): each charge books bytes / rate seconds
+on the clock, and a download only waits once the clock runs more than
+BURST_SECONDS ahead of real time.
+
+Streaming playback has priority. libvlc fetches the audio itself, so its bytes
+cannot be charged here; instead, while a stream plays, PLAYBACK_RESERVE_KBPS
+of the link is kept free by lowering the rate bulk downloads may use. Without
+an explicit limit, the link capacity is taken from the bandwidth measured
+before playback started, so bulk downloads still back off for the stream.
+
+The limit can be changed at any time with set_limit(); shares() reports how
+the recent throughput was split between the running downloads.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+import stream_quality
+
+# Default limit for all downloads together, in kbit/s (0 = unlimited)
+DEFAULT_LIMIT_KBPS = max(0, int(os.getenv("BANDWIDTH_LIMIT_KBPS", "0"))) or None
+# Bandwidth kept free for streaming playback, in kbit/s
+PLAYBACK_RESERVE_KBPS = int(os.getenv("PLAYBACK_RESERVE_KBPS", "512"))
+# Bulk downloads keep at least this fraction of the limit while a stream plays
+MIN_BULK_SHARE = 0.1
+# Seconds of traffic a download may send ahead of the limit
+BURST_SECONDS = 0.5
+# Seconds of history behind shares()
+SHARE_WINDOW = 5.0
+# Longest single sleep, so limit changes take effect quickly
+MAX_WAIT = 0.25
+
+_lock = threading.Lock()
+_changed = threading.Condition(_lock)
+_limit_kbps = DEFAULT_LIMIT_KBPS
+_streaming = False
+_link_kbps = None  # Measured bandwidth when the current stream started
+_clock = 0.0  # Virtual time up to which bandwidth is booked
+_generation = 0  # Bumped on every limit change to wake sleeping downloads
+_seen = {}  # File being downloaded -> bytes already charged
+_delayed = set()  # Files whose download the governor slowed down
+_usage = {}  # consumer label -> [(timestamp, bytes), ...] within SHARE_WINDOW
+_local = threading.local()
+
+
+def set_limit(kbps):
+    """
+    Changes the limit for all downloads together, effective immediately.
+
+    Args:
+        kbps (int): Limit in kbit/s, or None / 0 for unlimited. Negative
+            values also mean unlimited; positive ones are at least 1.
+    """
+    global _limit_kbps, _clock, _generation
+    with _lock:
+        _limit_kbps = max(1, int(kbps)) if kbps and kbps > 0 else None
+        _clock = time.monotonic()  # Forget bookings made at the old rate
+        _generation += 1
+        _changed.notify_all()
+
+
+def get_limit():
+    """Returns the limit in kbit/s, or None if downloads are unlimited."""
+    return _limit_kbps
+
+
+def set_streaming(active):
+    """
+    Tells the governor whether a network stream is playing.
+
+    Args:
+        active (bool): True while the player streams audio over the network.
+    """
+    global _streaming, _link_kbps, _generation
+    with _lock:
+        if active == _streaming:
+            return
+        _streaming = active
+        _link_kbps = stream_quality.estimated_kbps() if active else None
+        _generation += 1
+        _changed.notify_all()
+
+
+def bulk_rate():
+    """
+    Returns the rate downloads may use right now.
+
+    Returns:
+        float: Bytes per second, or None if downloads are not limited.
+    """
+    total = _limit_kbps or (_link_kbps if _streaming else None)
+    if total is None:
+        return None
+    if _streaming:
+        total = max(total - PLAYBACK_RESERVE_KBPS, total * MIN_BULK_SHARE)
+    return total * 1000 / 8
+
+
+@contextmanager
+def consumer(label):
+    """
+    Attributes the downloads made by this thread to ``label`` in shares().
+
+    Args:
+        label (str): Name of the download, e.g. the video title.
+    """
+    previous = getattr(_local, "label", None)
+    _local.label = label
+    try:
+        yield
+    finally:
+        _local.label = previous
+
+
+def _record_usage(label, byte_count, now):
+    """Adds bytes to a consumer's history. Caller holds the lock."""
+    history = _usage.setdefault(label, [])
+    history.append((now, byte_count))
+    while history and history[0][0] < now - SHARE_WINDOW:
+        history.pop(0)
+
+
+def charge(byte_count, fallback_label=None):
+    """
+    Books bytes that were just received and waits if the limit is exceeded.
+
+    Args:
+        byte_count (int): Bytes received since the last call.
+        fallback_label (str): Consumer to attribute the bytes to if the
+            thread has none (see consumer()).
+
+    Returns:
+        bool: True if the download had to wait.
+    """
+    global _clock
+    if byte_count <= 0:
+        return False
+    with _lock:
+        now = time.monotonic()
+        _record_usage(getattr(_local, "label", None) or fallback_label or "other", byte_count, now)
+        rate = bulk_rate()
+        if rate is None:
+            return False
+        _clock = max(_clock, now - BURST_SECONDS) + byte_count / rate
+        deadline = _clock - BURST_SECONDS
+        generation = _generation
+        waited = False
+        while _generation == generation:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            waited = True
+            _changed.wait(min(remaining, MAX_WAIT))
+        return waited
+
+
+def progress_hook(status):
+    """
+    yt-dlp progress hook that charges each downloaded block to the governor.
+
+    Finished downloads the governor never slowed down are passed on to the
+    stream_quality meter; a throttled one measures the limit, not the link.
+    """
+    key = status.get("tmpfilename") or status.get("filename")
+    downloaded = status.get("downloaded_bytes") or 0
+    with _lock:
+        if status.get("status") != "downloading":
+            _seen.pop(key, None)
+            delayed = key in _delayed
+            _delayed.discard(key)
+            if status.get("status") == "finished" and not delayed:
+                stream_quality.progress_hook(status)
+            return
+        # The first report of a file may include bytes resumed from a .part file.
+        # Fragment threads report the file's total and may do so out of order.
+        previous = _seen.get(key, downloaded)
+        _seen[key] = max(previous, downloaded)
+    # Fragment downloads report from yt-dlp's own threads, which carry no label
+    if charge(downloaded - previous, (status.get("info_dict") or {}).get("title")):
+        with _lock:
+            _delayed.add(key)
+
+
+def wake():
+    """Releases downloads waiting for bandwidth, e.g. when they are being canceled."""
+    global _generation
+    with _lock:
+        _generation += 1
+        _changed.notify_all()
+
+
+def shares():
+    """
+    Reports how recent download throughput was split.
+
+    Returns:
+        list: (label, bytes per second, share of the total) tuples, largest first.
+    """
+    with _lock:
+        now = time.monotonic()
+        rates = {}
+        for label, history in list(_usage.items()):
+            recent = sum(count for stamp, count in history if stamp >= now - SHARE_WINDOW)
+            if recent:
+                rates[label] = recent / SHARE_WINDOW
+            else:
+                del _usage[label]
+    total = sum(rates.values())
+    return sorted(((label, rate, rate / total) for label, rate in rates.items()), key=lambda item: -item[1])
+
+
+def total_rate():
+    """Returns the combined download rate over the last SHARE_WINDOW seconds, in bytes per second."""
+    return sum(rate for _, rate, _ in shares())
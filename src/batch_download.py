@@ -0,0 +1,176 @@
+"""
+Non-interactive batch downloader.
+
+Reads YouTube URLs (videos or playlists) from a file or stdin, downloads them
+with one format policy through the parallel download queue, and writes a JSON
+summary. Suitable for unattended runs, e.g. from cron:
+
+    python src/batch_download.py urls.txt --policy 720p --summary report.json
+    cat urls.txt | python src/batch_download.py --policy audio
+
+Lines that are empty or start with '#' are ignored. The exit status is 0 when
+every download succeeded, 1 when some failed and 2 on invalid arguments.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import bandwidth
+import download_journal
+import download_queue
+import postprocess
+from utils import extract_playlist_id, extract_video_id
+from video_downloader import is_youtube_url
+
+
+def read_urls(source):
+    """
+    Reads URLs from an open file, one per line.
+
+    Args:
+        source (file): File object to read.
+
+    Returns:
+        list: The URLs, without blank lines and comments.
+    """
+    urls = []
+    for line in source:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            urls.append(line)
+    return urls
+
+
+def build_jobs(urls, format_selector, path, postprocess_steps=None):
+    """
+    Creates download jobs for the URLs, expanding playlists.
+
+    Returns:
+        tuple: (jobs, list of {"url", "error"} for URLs that were rejected)
+    """
+    jobs = []
+    rejected = []
+    for url in urls:
+        if not is_youtube_url(url):
+            rejected.append({"url": url, "error": "not a YouTube URL"})
+        elif extract_playlist_id(url) and not extract_video_id(url):
+            try:
+                playlist_jobs = download_queue.expand_playlist(url, format_selector, path, postprocess_steps)
+            except ValueError as e:
+                rejected.append({"url": url, "error": str(e)})
+                continue
+            if playlist_jobs:
+                jobs.extend(playlist_jobs)
+            else:
+                rejected.append({"url": url, "error": "playlist is empty"})
+        else:
+            jobs.append(download_queue.make_job(url, format_selector, path, postprocess_steps=postprocess_steps))
+    return jobs, rejected
+
+
+def summarize(jobs, rejected, policy, started_at):
+    """Builds the machine-readable summary of a batch run."""
+    return {
+        "started_at": started_at,
+        "finished_at": time.time(),
+        "policy": policy,
+        "total": len(jobs),
+        "done": sum(job["state"] == "done" for job in jobs),
+        "skipped": sum(job["skipped"] for job in jobs),
+        "failed": sum(job["state"] == "failed" for job in jobs),
+        "not_run": sum(job["state"] == "queued" for job in jobs),
+        "rejected": rejected,
+        "jobs": [
+            {
+                "url": job["url"],
+                "video_id": job["video_id"],
+                "title": job["title"],
+                "state": job["state"],
+                "skipped": job["skipped"],
+                "error": job["error"],
+                "files": sorted(job["progress"]),
+            }
+            for job in jobs
+        ],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download YouTube videos and playlists without prompts.")
+    parser.add_argument("source", nargs="?", default="-", help="file with one URL per line (default: stdin)")
+    parser.add_argument(
+        "--policy",
+        default="best",
+        help=(
+            "format policy: best, 720p, 480p, audio, small, any <height>p, smallest:<constraint> "
+            "(e.g. 'smallest:height>=720'), or format:<yt-dlp selector> (default: best)"
+        ),
+    )
+    parser.add_argument("--output", default=os.path.join(os.getcwd(), "downloads"), help="download directory")
+    parser.add_argument("--workers", type=int, default=download_queue.DOWNLOAD_WORKERS, help="parallel downloads")
+    parser.add_argument("--summary", default="-", help="where to write the JSON summary (default: stdout)")
+    parser.add_argument("--resume", action="store_true", help="also resume unfinished jobs from earlier runs")
+    parser.add_argument(
+        "--postprocess",
+        action="append",
+        default=[],
+        metavar="STEP",
+        help="post-processing step, repeatable: remux:<ext>, extract_audio[:<codec>], embed_thumbnail",
+    )
+    parser.add_argument("--fragments", type=int, help="fragments of one video downloaded at once")
+    parser.add_argument("--chunk-mb", type=int, help="size of each HTTP range request, in MB")
+    parser.add_argument("--fragment-retries", type=int, help="retries for each fragment")
+    parser.add_argument("--limit", type=int, help="bandwidth limit for all downloads together, in kbit/s")
+    parser.add_argument("--force", action="store_true", help="download videos again even if already archived")
+    parser.add_argument("--progress", action="store_true", help="show the progress line (on by default on a terminal)")
+    args = parser.parse_args(argv)
+
+    try:
+        format_selector = download_queue.policy_selector(args.policy)
+        steps = [postprocess.parse_step(step) for step in args.postprocess]
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.limit is not None and args.limit <= 0:
+        parser.error("--limit must be a positive number of kbit/s")
+
+    if args.source == "-":
+        urls = read_urls(sys.stdin)
+    else:
+        try:
+            with open(args.source, "r") as source:
+                urls = read_urls(source)
+        except OSError as e:
+            parser.error(f"cannot read {args.source}: {e}")
+
+    if args.limit:
+        bandwidth.set_limit(args.limit)
+    if args.fragments:
+        download_queue.FRAGMENT_OPTIONS["concurrent_fragment_downloads"] = args.fragments
+    if args.chunk_mb:
+        download_queue.FRAGMENT_OPTIONS["http_chunk_size"] = args.chunk_mb * 1024 * 1024
+    if args.fragment_retries is not None:
+        download_queue.FRAGMENT_OPTIONS["fragment_retries"] = args.fragment_retries
+
+    started_at = time.time()
+    os.makedirs(args.output, exist_ok=True)
+    jobs, rejected = build_jobs(urls, format_selector, args.output, steps)
+    if args.resume:
+        jobs = [download_queue.restore_job(entry) for entry in download_journal.unfinished()] + jobs
+
+    show_progress = args.progress or (sys.stdout.isatty() and args.summary != "-")
+    download_queue.run_jobs(jobs, workers=args.workers, show_progress=show_progress, archive=not args.force)
+
+    summary = summarize(jobs, rejected, args.policy, started_at)
+    if args.summary == "-":
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.summary, "w") as file:
+            json.dump(summary, file, indent=2)
+    return 0 if summary["done"] == summary["total"] and not rejected else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
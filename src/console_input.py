@@ -0,0 +1,80 @@
+"""
+Non-blocking command input for the interactive players.
+"""
+import os
+import sys
+import threading
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import select
+    import termios
+    import tty
+
+
+class CommandReader:
+    """
+    Reads single keystrokes from the terminal on a background thread.
+
+    Input is only consumed between start() and stop(), so menus that call
+    input() afterwards are unaffected. The terminal is switched to
+    unbuffered, non-echoing input until stop() restores it.
+
+    Args:
+        on_key (callable): Called with each key as soon as it is pressed, or
+            with None once the input stream is closed.
+    """
+
+    def __init__(self, on_key):
+        self.on_key = on_key
+        self._stop = threading.Event()
+        self._thread = None
+        self._saved_mode = None
+
+    def start(self):
+        """Starts delivering keys to ``on_key``."""
+        self._stop.clear()
+        if os.name != "nt" and sys.stdin.isatty():
+            fd = sys.stdin.fileno()
+            self._saved_mode = termios.tcgetattr(fd)
+            tty.setcbreak(fd)
+        self._thread = threading.Thread(
+            target=self._run_windows if os.name == "nt" else self._run_posix,
+            name="command-reader",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stops reading, waits for the reader thread and restores the terminal."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._saved_mode is not None:
+            termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, self._saved_mode)
+            self._saved_mode = None
+
+    def _run_posix(self):
+        """Waits on stdin with select() and delivers the raw bytes key by key."""
+        fd = sys.stdin.fileno()
+        while not self._stop.is_set():
+            # The timeout only bounds how long stop() waits for this thread
+            ready, _, _ = select.select([fd], [], [], 0.2)
+            if not ready:
+                continue
+            data = os.read(fd, 1024)
+            if not data:
+                self.on_key(None)
+                return
+            for key in data.decode(errors="ignore"):
+                self.on_key(key)
+
+    def _run_windows(self):
+        """Delivers keystrokes from the console without echoing them."""
+        while not self._stop.is_set():
+            if not msvcrt.kbhit():
+                self._stop.wait(0.05)
+                continue
+            self.on_key(msvcrt.getwch())
@@ -12,10 +12,22 @@ SONGS_FILE = "songs.json"
 PLAYLISTS_FILE = "playlists.json"
 DOWNLOADS_DIR = "downloads"
 QR_CODES_DIR = "qr_codes"
+CACHE_DIR = "cache"
+STREAM_CACHE_FILE = "cache/stream_urls.json"
+PLAYLIST_CACHE_DIR = "cache/playlists"
+AUDIO_CACHE_DIR = "cache/audio"
+AUDIO_CACHE_INDEX_FILE = "cache/audio/index.json"
+STREAM_QUALITY_FILE = "stream_quality.json"
+DOWNLOAD_JOURNAL_DIR = "cache/download_journal"
+DOWNLOAD_JOURNAL_FILE = "cache/download_journal.json"  # Single-file journal of older versions
+DOWNLOAD_ARCHIVE_FILE = "cache/download_archive.sqlite3"
+INFO_CACHE_DIR = "cache/info"
 
 # YouTube URL Patterns
 YOUTUBE_PATTERN1 = r"^https?://(?:www\.)?(?:youtube\.com|youtu\.be)/.*$"
 YOUTUBE_PATTERN2 = r"^https?://(www\.)?youtube\.com/playlist\?list=.*$"
+YOUTUBE_PLAYLIST_ID_PATTERN = r"[?&]list=([A-Za-z0-9_-]+)"
+YOUTUBE_VIDEO_ID_PATTERN = r"(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})"
 
 # Terminal Colors (supported by termcolor and terminal_color function)
 SUPPORTED_COLORS = [
@@ -33,6 +45,8 @@ DEFAULT_QR_BACK_COLOR = "white"
 API_TIMEOUT = 5  # seconds
 CACHE_MAX_SIZE = 128
 JOKE_CACHE_MAX_SIZE = 32
+STREAM_CACHE_REFRESH_MARGIN = 1800  # seconds before expiry to treat a URL as stale
+STREAM_CACHE_DEFAULT_TTL = 3600  # seconds, used when a URL carries no expiry
 
 # Error Messages
 ERROR_INVALID_URL = "Invalid YouTube URL format. Please enter valid YouTube URLs (youtube.com or youtu.be)."
@@ -0,0 +1,162 @@
+"""
+Archive of finished downloads, keyed by YouTube video ID and format.
+
+Every completed download is recorded in an SQLite file with its output path,
+size, modification time and SHA-256 checksum. Before a job does any network
+work the archive is asked whether that video was already downloaded in that
+format; a hit costs one primary-key lookup and a stat() of the file.
+
+Entries are checked against the disk on every lookup:
+
+- If the file is still where it was recorded (same size and modification
+  time) the download is skipped.
+- If it is gone, the job's output directory is searched for a file of the same
+  size, and a matching checksum moves the entry to its new location.
+- Otherwise the entry is dropped and the video is downloaded again.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from constants import DOWNLOAD_ARCHIVE_FILE
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    video_id      TEXT NOT NULL,
+    format        TEXT NOT NULL,
+    path          TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    mtime         REAL NOT NULL,
+    sha256        TEXT NOT NULL,
+    downloaded_at REAL NOT NULL,
+    PRIMARY KEY (video_id, format)
+);
+DROP INDEX IF EXISTS downloads_by_checksum;
+"""
+
+_lock = threading.Lock()
+_connection = None  # Opened lazily, shared by all download threads
+
+
+def _connect():
+    """Returns the archive connection, creating the database on first use. Caller holds the lock."""
+    global _connection
+    if _connection is None:
+        directory = os.path.dirname(DOWNLOAD_ARCHIVE_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _connection = sqlite3.connect(DOWNLOAD_ARCHIVE_FILE, check_same_thread=False)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.executescript(_SCHEMA)
+    return _connection
+
+
+def _sha256(path):
+    """Returns the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _find_moved(directory, size, checksum):
+    """Looks in a directory for a file with the given size and checksum."""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return None
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if os.path.isfile(path) and os.path.getsize(path) == size and _sha256(path) == checksum:
+                return os.path.abspath(path)
+        except OSError:
+            continue
+    return None
+
+
+def lookup(video_id, format_selector, directory=None):
+    """
+    Returns the file a video was already downloaded to, if it still exists.
+
+    Args:
+        video_id (str): YouTube video ID.
+        format_selector (str): yt-dlp format ID or selector of the download.
+        directory (str): Where to look for the file if it was moved.
+
+    Returns:
+        str: Path of the downloaded file, or None if the video has to be downloaded.
+    """
+    if not video_id:
+        return None
+    try:
+        with _lock:
+            row = _connect().execute(
+                "SELECT path, size, mtime, sha256 FROM downloads WHERE video_id = ? AND format = ?",
+                (video_id, format_selector),
+            ).fetchone()
+    except (OSError, sqlite3.Error):
+        # No usable archive (e.g. a read-only data directory): nothing counts as downloaded
+        return None
+    if row is None:
+        return None
+    path, size, mtime, checksum = row
+    try:
+        stat = os.stat(path)
+        if stat.st_size == size and stat.st_mtime == mtime:
+            return path
+        if stat.st_size == size and _sha256(path) == checksum:
+            # Touched but unchanged; remember the new time so the next lookup is cheap again
+            record(video_id, format_selector, path, checksum)
+            return path
+    except OSError:
+        pass
+    moved = _find_moved(directory, size, checksum) if directory else None
+    if moved:
+        record(video_id, format_selector, moved, checksum)
+        return moved
+    forget(video_id, format_selector)
+    return None
+
+
+def record(video_id, format_selector, path, checksum=None):
+    """
+    Adds a finished download to the archive.
+
+    Args:
+        video_id (str): YouTube video ID.
+        format_selector (str): yt-dlp format ID or selector of the download.
+        path (str): The downloaded file.
+        checksum (str): SHA-256 of the file, if already known.
+    """
+    if not video_id:
+        return
+    try:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        checksum = checksum or _sha256(path)
+        with _lock:
+            connection = _connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (video_id, format_selector, path, stat.st_size, stat.st_mtime, checksum, time.time()),
+                )
+    except (OSError, sqlite3.Error):
+        # Only costs a repeated download later
+        pass
+
+
+def forget(video_id, format_selector):
+    """Removes a download from the archive."""
+    try:
+        with _lock:
+            connection = _connect()
+            with connection:
+                connection.execute(
+                    "DELETE FROM downloads WHERE video_id = ? AND format = ?", (video_id, format_selector)
+                )
+    except (OSError, sqlite3.Error):
+        pass
@@ -0,0 +1,129 @@
+"""
+Crash-safe journal of download jobs.
+
+Every job handed to the download queue is written to its own file in
+DOWNLOAD_JOURNAL_DIR together with its state, and that file is rewritten
+atomically on each state change. If the app is killed mid-batch, the next
+start finds the unfinished jobs there and can resume them; yt-dlp then
+continues their .part files. Jobs that finished (or failed) are dropped once
+their batch is over.
+
+One file per job means that several processes (e.g. batch_download.py next to
+the interactive downloader) can journal at the same time without one
+overwriting the jobs of the other.
+"""
+import json
+import os
+import threading
+from constants import DOWNLOAD_JOURNAL_DIR, DOWNLOAD_JOURNAL_FILE
+
+# Job fields worth keeping across restarts (progress and extracted info are not)
+JOURNAL_FIELDS = (
+    "id", "url", "video_id", "title", "format", "path", "postprocess", "state", "error", "queued_at",
+)
+
+_lock = threading.Lock()
+_migrated = False
+
+
+def _path(job_id):
+    return os.path.join(DOWNLOAD_JOURNAL_DIR, f"{job_id}.json")
+
+
+def _write(entry):
+    """Writes one entry so that a crash leaves either the old or the new file."""
+    try:
+        os.makedirs(DOWNLOAD_JOURNAL_DIR, exist_ok=True)
+        temp_file = _path(entry["id"]) + f".{os.getpid()}.tmp"
+        with open(temp_file, "w") as file:
+            json.dump(entry, file, indent=1)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, _path(entry["id"]))
+    except OSError:
+        # Downloads still work, they just cannot be resumed after a crash
+        pass
+
+
+def _migrate():
+    """Moves the entries of the old single-file journal into per-job files. Caller holds the lock."""
+    global _migrated
+    if _migrated:
+        return
+    _migrated = True
+    try:
+        with open(DOWNLOAD_JOURNAL_FILE, "r") as file:
+            entries = json.load(file)
+        for entry in entries:
+            _write(entry)
+        os.remove(DOWNLOAD_JOURNAL_FILE)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+
+def _entry(job):
+    return {field: job.get(field) for field in JOURNAL_FIELDS}
+
+
+def record(job):
+    """
+    Adds or updates a job in the journal.
+
+    Args:
+        job (dict): A download queue job.
+    """
+    with _lock:
+        _write(_entry(job))
+
+
+def record_all(jobs):
+    """Adds a whole batch of jobs."""
+    with _lock:
+        for job in jobs:
+            _write(_entry(job))
+
+
+def unfinished():
+    """
+    Returns the jobs that were queued or downloading when the app last stopped.
+
+    Returns:
+        list: Journal entries, oldest first, with state reset to "queued".
+    """
+    entries = []
+    with _lock:
+        _migrate()
+        try:
+            names = os.listdir(DOWNLOAD_JOURNAL_DIR)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(DOWNLOAD_JOURNAL_DIR, name), "r") as file:
+                    entry = json.load(file)
+            except (OSError, ValueError):
+                continue  # Removed by another process, or cut short by a crash
+            if isinstance(entry, dict) and entry.get("state") in ("queued", "downloading", "processing"):
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry.get("queued_at") or 0)
+    for entry in entries:
+        entry["state"] = "queued"
+    return entries
+
+
+def forget(jobs):
+    """
+    Removes jobs from the journal, e.g. when their batch is over or the user
+    declines to resume them.
+
+    Args:
+        jobs (list): Jobs or journal entries with an 'id' key.
+    """
+    with _lock:
+        for job in jobs:
+            try:
+                os.remove(_path(job["id"]))
+            except OSError:
+                pass
@@ -0,0 +1,617 @@
+"""
+Parallel download queue for the video/audio downloader.
+
+Format choices are collected up front, one job per video (playlists are
+expanded into one job per entry), and the jobs are then downloaded by a
+bounded worker pool while a single progress line covers all of them.
+Formats that need merging, and jobs with post-processing steps, are
+downloaded as raw files and handed to the post-processing process pool, so
+ffmpeg work overlaps with the next downloads.
+
+Jobs are recorded in the download journal as they change state, so a batch
+that was interrupted can be resumed later. Finished downloads go into the
+download archive, and a job whose video is already there in the same format
+is skipped before anything is fetched from YouTube. A job is a plain dictionary:
+
+    id           Unique job ID (journal key)
+    url          YouTube URL of the video
+    video_id     YouTube video ID
+    title        Title shown in the progress display
+    format       yt-dlp format ID or selector, or "smallest:<constraint>"
+                 (see format_table), resolved once the formats are known
+    path         Directory the file is written to
+    postprocess  Post-processing steps after the download (see postprocess)
+    state        "queued", "downloading", "processing", "done" or "failed"
+    progress     Output filename -> [downloaded bytes, total bytes]
+    error        Error message of a failed job
+    skipped      True if the video was already in the download archive
+    info         Already extracted video information, if any (reused for the download)
+"""
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from termcolor import colored
+from yt_dlp.utils import DownloadCancelled, DownloadError, ReExtractInfo
+import ydl_pool
+import bandwidth
+import download_archive
+import download_journal
+import format_table
+import info_cache
+import postprocess
+from console_input import CommandReader
+from playlist_stream import PlaylistStream
+from utils import SilentLogger, extract_video_id
+
+# Number of videos downloaded in parallel
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "3"))
+# Segmented downloads: fragments of one video fetched at once, bytes per HTTP
+# range request for unfragmented formats, and retries for each fragment
+FRAGMENT_OPTIONS = {
+    "concurrent_fragment_downloads": int(os.getenv("FRAGMENT_WORKERS", "4")),
+    "http_chunk_size": int(os.getenv("HTTP_CHUNK_MB", "10")) * 1024 * 1024,
+    "fragment_retries": int(os.getenv("FRAGMENT_RETRIES", "10")),
+}
+# Have yt-dlp split YouTube's single-file formats into range fragments, so they
+# are fetched concurrently as well instead of over one connection
+SEGMENTED_DOWNLOADS = os.getenv("SEGMENTED_DOWNLOADS", "1") == "1"
+# Factor the + / - keys change the bandwidth limit by, and the lowest limit (kbit/s)
+LIMIT_STEP = 1.25
+MIN_LIMIT_KBPS = 64
+
+# Named format policies, usable wherever a format is chosen for many videos at once
+FORMAT_POLICIES = {
+    "best": ("Best video + best audio", "bestvideo*+bestaudio/best"),
+    "720p": ("Best video up to 720p + best audio", "bestvideo*[height<=720]+bestaudio/best[height<=720]/best"),
+    "480p": ("Best video up to 480p + best audio", "bestvideo*[height<=480]+bestaudio/best[height<=480]/best"),
+    "audio": ("Audio only", "bestaudio/best"),
+    "small": ("Smallest file with at least 720p video", "smallest:height>=720"),
+}
+# Format prefix for a constraint resolved by format_table.select_smallest
+SMALLEST_PREFIX = "smallest:"
+
+
+def policy_selector(policy):
+    """
+    Translates a format policy into a yt-dlp format selector.
+
+    A policy is one of the FORMAT_POLICIES names, a height such as "1080p"
+    (best video up to that height + best audio), "smallest:<constraint>"
+    (the smallest format meeting a format_table constraint), or a raw yt-dlp
+    selector prefixed with "format:".
+
+    Args:
+        policy (str): The policy.
+
+    Returns:
+        str: The format selector.
+
+    Raises:
+        ValueError: If the policy is not understood.
+    """
+    policy = policy.strip()
+    if policy.lower() in FORMAT_POLICIES:
+        return FORMAT_POLICIES[policy.lower()][1]
+    height = re.fullmatch(r"(\d{3,4})p", policy.lower())
+    if height:
+        limit = height.group(1)
+        return f"bestvideo*[height<={limit}]+bestaudio/best[height<={limit}]/best"
+    if policy.lower().startswith(SMALLEST_PREFIX):
+        format_table.parse_constraint(policy[len(SMALLEST_PREFIX):])  # Raises ValueError if invalid
+        return SMALLEST_PREFIX + policy[len(SMALLEST_PREFIX):].strip()
+    if policy.startswith("format:") and policy[len("format:"):].strip():
+        return policy[len("format:"):].strip()
+    raise ValueError(f"Unknown format policy: {policy}")
+
+
+_lock = threading.Lock()
+_active = {}  # video ID -> job being downloaded, for the progress hook
+_local = threading.local()  # The job the current worker thread is downloading
+_cancel = threading.Event()
+
+
+# Keeps yt-dlp messages out of the progress line; errors are reported per job
+_SILENT_LOGGER = SilentLogger()
+
+
+def make_job(url, format_selector, path, title=None, video_id=None, info=None, postprocess_steps=None):
+    """
+    Creates a queued download job.
+
+    Args:
+        url (str): YouTube URL of the video.
+        format_selector (str): yt-dlp format ID or selector.
+        path (str): Directory to save the file in.
+        title (str): Title for the progress display.
+        video_id (str): YouTube video ID (read from the URL if not given).
+        info (dict): Already extracted video information to reuse.
+        postprocess_steps (list): Steps from postprocess.STEP_NAMES to run
+            after the download.
+
+    Returns:
+        dict: The job.
+    """
+    return {
+        "id": uuid.uuid4().hex,
+        "url": url,
+        "video_id": video_id or extract_video_id(url) or (info or {}).get("id"),
+        "title": title or (info or {}).get("title") or url,
+        "format": format_selector,
+        "path": path,
+        "postprocess": list(postprocess_steps or []),
+        "state": "queued",
+        "progress": {},
+        "error": None,
+        "skipped": False,
+        "info": info,
+        "queued_at": time.time(),
+    }
+
+
+def restore_job(entry):
+    """
+    Turns a journal entry back into a queued job.
+
+    Args:
+        entry (dict): Entry from download_journal.unfinished().
+
+    Returns:
+        dict: The job.
+    """
+    return dict(
+        entry, postprocess=entry.get("postprocess") or [], state="queued", progress={}, error=None, skipped=False, info=None
+    )
+
+
+def expand_playlist(playlist_url, format_selector, path, postprocess_steps=None):
+    """
+    Turns a playlist URL into one job per video.
+
+    Args:
+        playlist_url (str): YouTube playlist URL.
+        format_selector (str): yt-dlp format selector applied to every video.
+        path (str): Directory to save the files in.
+        postprocess_steps (list): Post-processing steps applied to every video.
+
+    Returns:
+        list: Jobs (empty for an empty playlist).
+
+    Raises:
+        ValueError: If the playlist could not be read.
+    """
+    # A cached listing may be missing videos added since; downloads need the live one
+    videos = PlaylistStream(playlist_url, use_cache=False)
+    if not videos.start():
+        raise ValueError(f"Failed to fetch playlist information: {videos.error}")
+    videos.wait_complete()
+    return [
+        make_job(
+            video["url"], format_selector, path, title=video["title"], video_id=video["id"],
+            postprocess_steps=postprocess_steps,
+        )
+        for video in videos[:]
+    ]
+
+
+def _on_progress(status):
+    """yt-dlp progress hook: records byte counts on the job and aborts on cancel."""
+    if _cancel.is_set():
+        raise DownloadCancelled("Download canceled by the user")
+    job = _active.get((status.get("info_dict") or {}).get("id")) or getattr(_local, "job", None)
+    if job is None or not status.get("filename"):
+        return
+    total = status.get("total_bytes") or status.get("total_bytes_estimate") or 0
+    downloaded = status.get("downloaded_bytes") or 0
+    if status.get("status") == "finished":
+        total = total or downloaded
+    job["progress"][status["filename"]] = [downloaded, total]
+
+
+def extractor_options():
+    """
+    Returns the extraction options that make formats downloadable in segments.
+
+    Used for the download itself and by callers that extract a video's
+    information ahead of time, so that information can be reused.
+    """
+    if SEGMENTED_DOWNLOADS and FRAGMENT_OPTIONS["concurrent_fragment_downloads"] > 1:
+        return {"extractor_args": {"youtube": {"formats": ["dashy"]}}}
+    return {}
+
+
+def extraction_profile():
+    """Returns the info cache profile matching extractor_options()."""
+    return "segmented" if extractor_options() else None
+
+
+def download_options(job, format_selector=None):
+    """
+    Builds the yt-dlp options for a job.
+
+    Hooks are module functions, so every job with the same format and
+    directory borrows sessions from the same pool profile.
+
+    Args:
+        job (dict): The job.
+        format_selector (str): Format to use instead of the job's own.
+    """
+    return {
+        **FRAGMENT_OPTIONS,
+        **extractor_options(),
+        "outtmpl": os.path.join(job["path"], "%(title)s.%(ext)s"),
+        "format": format_selector or job["format"],
+        "quiet": True,
+        "no_warnings": True,
+        "noprogress": True,
+        "continuedl": True,  # Pick up .part files left by an interrupted run
+        "logger": _SILENT_LOGGER,
+        "progress_hooks": [_on_progress, bandwidth.progress_hook],
+    }
+
+
+def _output_file(ydl, info):
+    """Returns the final file a download produced (after merging), or None."""
+    downloads = info.get("requested_downloads") or [info]
+    path = downloads[-1].get("filepath") or downloads[-1].get("_filename")
+    if not path:
+        path = ydl.prepare_filename(info)
+    return path if path and os.path.isfile(path) else None
+
+
+def _archive_key(job):
+    """Returns the archive format key; post-processing changes what the file is."""
+    steps = job.get("postprocess")
+    return f"{job['format']}|{','.join(steps)}" if steps else job["format"]
+
+
+def _skip_archived(job):
+    """Marks a job done if its video is already in the download archive."""
+    path = download_archive.lookup(job["video_id"], _archive_key(job), job["path"])
+    if path is None:
+        return False
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    job.update(state="done", skipped=True, progress={path: [size, size]})
+    return True
+
+
+def _pick_smallest(job, info):
+    """
+    Resolves a "smallest:<constraint>" job format to a concrete selector.
+
+    Returns:
+        tuple: (video information, format selector)
+
+    Raises:
+        ValueError: If no format meets the constraint.
+    """
+    constraint = job["format"][len(SMALLEST_PREFIX):]
+    if info is None:
+        with ydl_pool.borrow({"quiet": True, "no_warnings": True, **extractor_options()}) as ydl:
+            info = ydl.extract_info(job["url"], download=False)
+        info_cache.store(info, extraction_profile())
+    row = format_table.select_smallest(info, constraint)
+    if row is None:
+        raise ValueError(f"No format meets '{constraint}'")
+    return info, row["id"]
+
+
+def _download_parts(job, info, options):
+    """
+    Downloads the raw files of a job, one per requested format, without
+    merging or converting them. A single format with no steps to run is
+    downloaded the regular way instead, yt-dlp's fixups included.
+
+    Returns:
+        tuple: (post-processing task, or None if the downloaded file already
+            is the result; path of the result, or of the task's first input)
+    """
+    steps = list(job.get("postprocess") or [])
+    with ydl_pool.borrow(options) as ydl:
+        if info is None:
+            info = ydl.extract_info(job["url"], download=False)
+            info_cache.store(info, extraction_profile())
+        selected = ydl.process_ie_result(ydl.sanitize_info(info, True), download=False)
+        target = ydl.prepare_filename(selected)
+        plain = ydl.sanitize_info(selected, True)
+    job["title"] = selected.get("title") or job["title"]
+    requested = selected.get("requested_formats") or [selected]
+    if len(requested) == 1 and not steps:
+        with ydl_pool.borrow(options) as ydl:
+            result = ydl.process_ie_result(ydl.sanitize_info(info, True), download=True)
+            return None, _output_file(ydl, result) or target
+    parts = []
+    thumbnails = []
+    for index, fmt in enumerate(requested):
+        part_options = dict(
+            options,
+            format=fmt["format_id"],
+            outtmpl=os.path.join(job["path"], "%(title)s.f%(format_id)s.%(ext)s"),
+            writethumbnail="embed_thumbnail" in steps and index == 0,
+        )
+        with ydl_pool.borrow(part_options) as ydl:
+            result = ydl.process_ie_result(ydl.sanitize_info(info, True), download=True)
+        parts.append(result["requested_downloads"][0]["filepath"])
+        thumbnails += [thumbnail for thumbnail in result.get("thumbnails") or [] if thumbnail.get("filepath")]
+    if len(parts) > 1:
+        steps.insert(0, "merge")
+    # Only plain data crosses into the worker process
+    task_info = dict(
+        plain,
+        filepath=target if len(parts) > 1 else parts[0],
+        __files_to_merge=parts,
+        requested_formats=[
+            {key: fmt.get(key) for key in ("format_id", "ext", "acodec", "vcodec", "protocol")} | {"filepath": path}
+            for fmt, path in zip(requested, parts)
+        ],
+        thumbnails=[
+            {key: value for key, value in thumbnail.items() if isinstance(value, (str, int, float))}
+            for thumbnail in thumbnails
+        ],
+    )
+    return {"steps": steps, "info": task_info}, task_info["filepath"]
+
+
+def _credit_output(job, output):
+    """Lists the finished file in the job's progress in place of its raw parts."""
+    downloaded = sum(done_bytes for done_bytes, _ in job["progress"].values())
+    job["progress"] = {output: [downloaded, downloaded]}
+
+
+def _remove_parts(task):
+    """Deletes the raw files of a task whose post-processing failed."""
+    info = task["info"]
+    paths = info["__files_to_merge"] + [thumbnail["filepath"] for thumbnail in info["thumbnails"]]
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _finish_postprocessing(job, task, future, journal, archive):
+    """Completes a job once its post-processing task has finished."""
+    try:
+        output = future.result()
+    except BaseException as e:  # Includes CancelledError
+        job["error"] = str(e) or type(e).__name__
+        job["state"] = "queued" if _cancel.is_set() else "failed"
+        if job["state"] == "failed":
+            _remove_parts(task)  # A resumed job keeps its parts and skips downloading them again
+    else:
+        _credit_output(job, output)
+        if archive:
+            download_archive.record(job["video_id"], _archive_key(job), output)
+        job["state"] = "done"
+    if journal:
+        download_journal.record(job)
+
+
+def download_job(job, journal=False, archive=True, postprocessor=None):
+    """
+    Downloads one job, reusing its extracted information (or the info cache's)
+    when its stream URLs are still valid.
+
+    With a postprocessor, or when the job has post-processing steps, formats
+    that need merging or converting are downloaded as raw files first and
+    merged/converted afterwards: in the
+    postprocessor's worker processes if there is one (the job is then left
+    in state "processing" and completes on its own), otherwise right here.
+
+    Args:
+        job (dict): The job to download.
+        journal (bool): Record the job's state changes in the download journal.
+        archive (bool): Skip videos already in the download archive and record
+            finished downloads there.
+        postprocessor (postprocess.PostProcessor): Pool to hand post-processing to.
+
+    Returns:
+        dict: The job, with state "done", "failed" or "processing" (or
+            "queued" again if the download was canceled, so it can be resumed).
+    """
+    if archive and _skip_archived(job):
+        job["info"] = None
+        if journal:
+            download_journal.record(job)
+        return job
+    job["state"] = "downloading"
+    if journal:
+        download_journal.record(job)
+    _local.job = job
+    with _lock:
+        _active[job["video_id"]] = job
+    try:
+        info, format_selector = job.get("info") or info_cache.get(job["video_id"], extraction_profile()), None
+        if job["format"].startswith(SMALLEST_PREFIX):
+            info, format_selector = _pick_smallest(job, info)
+        options = download_options(job, format_selector)
+        if postprocessor is not None or job.get("postprocess"):
+            with bandwidth.consumer(job["title"]):
+                try:
+                    task, output = _download_parts(job, info, options)
+                except (DownloadError, ReExtractInfo):
+                    if _cancel.is_set() or info is None:
+                        raise
+                    task, output = _download_parts(job, None, options)  # Stream URLs went stale
+            if task is not None:
+                if postprocessor is None:
+                    try:
+                        output = postprocess.run_steps(task)
+                    except Exception:
+                        _remove_parts(task)
+                        raise
+                else:
+                    job["state"] = "processing"
+                    future = postprocessor.submit(task)
+                    future.add_done_callback(lambda done: _finish_postprocessing(job, task, done, journal, archive))
+                    return job
+            _credit_output(job, output)
+            if archive:
+                download_archive.record(job["video_id"], _archive_key(job), output)
+            job["state"] = "done"
+            return job
+        with bandwidth.consumer(job["title"]), ydl_pool.borrow(options) as ydl:
+            if info is not None:
+                try:
+                    info = ydl.process_ie_result(ydl.sanitize_info(info, True), download=True)
+                except (DownloadError, ReExtractInfo):
+                    if _cancel.is_set():
+                        raise
+                    info = None  # Stream URLs went stale; extract the video again
+            if info is None:
+                info = ydl.extract_info(job["url"], download=True)
+            job["title"] = info.get("title") or job["title"]
+            job["video_id"] = job["video_id"] or info.get("id")
+            output = _output_file(ydl, info) if archive else None
+        if output:
+            download_archive.record(job["video_id"], _archive_key(job), output)
+        job["state"] = "done"
+    except Exception as e:
+        job["state"] = "queued" if _cancel.is_set() else "failed"
+        job["error"] = str(e)
+    finally:
+        job["info"] = None  # Stream URLs expire; do not keep them around
+        _local.job = None
+        with _lock:
+            _active.pop(job["video_id"], None)
+        if journal:
+            download_journal.record(job)
+    return job
+
+
+def _format_bytes(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024 or unit == "GB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+
+
+def print_progress(jobs):
+    """Redraws the single progress line covering all jobs."""
+    counts = {"queued": 0, "downloading": 0, "processing": 0, "done": 0, "failed": 0}
+    downloaded = total = 0
+    for job in jobs:
+        counts[job["state"]] += 1
+        for done_bytes, total_bytes in list(job["progress"].values()):
+            downloaded += done_bytes
+            total += total_bytes
+    line = (
+        f"Downloads: {counts['done']}/{len(jobs)} done | {counts['downloading']} active | "
+        f"{counts['processing']} processing | "
+        f"{counts['queued']} queued | {counts['failed']} failed | "
+        f"{_format_bytes(downloaded)} of {_format_bytes(total) if total else '?'} | "
+        f"{_format_bytes(bandwidth.total_rate())}/s"
+    )
+    limit = bandwidth.get_limit()
+    if limit:
+        line += f" (limit {limit} kbps)"
+    print("\r" + colored(line.ljust(100), "cyan"), end="", flush=True)
+
+
+def print_shares():
+    """Lists how the recent download throughput is split between the jobs."""
+    print()
+    for label, rate, share in bandwidth.shares():
+        print(colored(f"  {share:4.0%}  {_format_bytes(rate)}/s  {label}", "cyan"))
+
+
+def _on_limit_key(key):
+    """Handles a key pressed while downloading: adjusts the bandwidth limit or shows shares."""
+    key = key.lower()
+    limit = bandwidth.get_limit()
+    if key == "+" and limit:
+        bandwidth.set_limit(limit * LIMIT_STEP)
+    elif key == "-":
+        # Without a limit, start from what the downloads are getting right now
+        current = limit or bandwidth.total_rate() * 8 / 1000 or MIN_LIMIT_KBPS * LIMIT_STEP
+        bandwidth.set_limit(max(MIN_LIMIT_KBPS, current / LIMIT_STEP))
+    elif key == "u":
+        bandwidth.set_limit(None)
+    elif key == "s":
+        print_shares()
+
+
+def _report_finished(jobs, reported):
+    """Prints a line for every job that finished since the last call."""
+    for job in jobs:
+        if job["state"] in ("done", "failed") and job["id"] not in reported:
+            reported.add(job["id"])
+            if job["skipped"]:
+                print("\r" + colored(f"Already downloaded: {job['title']}".ljust(100), "yellow"))
+            elif job["state"] == "done":
+                print("\r" + colored(f"Downloaded: {job['title']}".ljust(100), "green"))
+            else:
+                print("\r" + colored(f"Failed: {job['title']} - {job['error']}".ljust(100), "red"))
+
+
+def run_jobs(jobs, workers=DOWNLOAD_WORKERS, show_progress=True, journal=True, archive=True):
+    """
+    Downloads jobs in parallel on a bounded worker pool, with merging and
+    conversion running in a separate pool of POSTPROCESS_WORKERS processes.
+
+    While the progress line is shown on a terminal, + and - change the
+    bandwidth limit, U removes it and S lists each download's share.
+
+    Args:
+        jobs (list): Jobs from make_job, expand_playlist or restore_job.
+        workers (int): Number of parallel downloads.
+        show_progress (bool): Draw the aggregate progress line and report each job.
+        journal (bool): Keep the jobs in the download journal until they have
+            finished, so an interrupted batch can be resumed.
+        archive (bool): Skip videos that were already downloaded in the same
+            format (pass False to download them again).
+
+    Returns:
+        list: The jobs, each with state "done" or "failed" (or still "queued"
+            if the run was canceled).
+    """
+    _cancel.clear()
+    if journal:
+        download_journal.record_all(jobs)
+    keys = queue.Queue()
+    reader = None
+    if show_progress and sys.stdin.isatty():
+        reader = CommandReader(keys.put)
+        print(colored("Keys: +/- bandwidth limit, U unlimited, S per-download shares, Ctrl+C cancel", "yellow"))
+        reader.start()
+    postprocessor = postprocess.PostProcessor() if postprocess.POSTPROCESS_WORKERS > 0 else None
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="download")
+    reported = set()
+    try:
+        pending = {executor.submit(download_job, job, journal, archive, postprocessor) for job in jobs}
+        while pending or any(job["state"] == "processing" for job in jobs):
+            if pending:
+                _, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            else:
+                time.sleep(0.5)  # Only post-processing is left
+            if not show_progress:
+                continue
+            while not keys.empty():
+                key = keys.get()
+                if key:
+                    _on_limit_key(key)
+            _report_finished(jobs, reported)
+            print_progress(jobs)
+        if show_progress:
+            _report_finished(jobs, reported)
+    except KeyboardInterrupt:
+        _cancel.set()
+        bandwidth.wake()  # Downloads waiting for bandwidth notice the cancel sooner
+        if show_progress:
+            print(colored("\nDownload canceled by the user.", "red"))
+    finally:
+        if reader:
+            reader.stop()
+        executor.shutdown(wait=True, cancel_futures=True)
+        if postprocessor:
+            postprocessor.shutdown(cancel=_cancel.is_set())
+        if journal:
+            # Unfinished jobs stay in the journal for the next run
+            download_journal.forget([job for job in jobs if job["state"] in ("done", "failed")])
+        if show_progress:
+            print()
+    return jobs
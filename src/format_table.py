@@ -0,0 +1,255 @@
+"""
+Structured format table and smallest-format selection.
+
+format_rows() turns the formats of an extracted video into rows with the
+resolution, fps, codecs, bitrate and size (exact where YouTube reports it,
+otherwise estimated from bitrate x duration); print_table() shows them sorted
+by any column.
+
+select_smallest() is the selection engine: given a constraint such as
+"height>=720, fps>=50" or "audio, abr>=128" it considers every single format
+and every video-only + audio-only pair, keeps those that satisfy all terms,
+and returns the yt-dlp selector of the smallest one.
+
+Constraint terms, separated by commas or spaces:
+
+    audio                 audio only (otherwise the result has video and audio)
+    <field><op><value>    op is one of >= <= > < =
+        height, fps       numbers
+        tbr, abr, vbr     bitrates in kbit/s
+        size              bytes, with an optional KB/MB/GB suffix
+        vcodec, acodec, ext   prefix match, e.g. vcodec=avc1 (only with =)
+"""
+import re
+from termcolor import colored
+
+# Columns print_table can sort by, and the row value each one uses
+SORT_KEYS = {
+    "id": lambda row: row["id"],
+    "resolution": lambda row: (row["height"] or 0, row["fps"] or 0),
+    "fps": lambda row: row["fps"] or 0,
+    "bitrate": lambda row: row["tbr"] or 0,
+    "size": lambda row: row["size"] if row["size"] is not None else float("inf"),
+    "codec": lambda row: (row["vcodec"] or "", row["acodec"] or ""),
+}
+NUMERIC_FIELDS = ("height", "fps", "tbr", "abr", "vbr", "size")
+TEXT_FIELDS = ("vcodec", "acodec", "ext")
+SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "kb": 1024, "m": 1024 ** 2, "mb": 1024 ** 2, "g": 1024 ** 3, "gb": 1024 ** 3}
+
+_TERM_PATTERN = re.compile(r"^([a-z]+)\s*(>=|<=|>|<|=)\s*([a-z0-9.]+)$")
+_OPERATORS = {
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b,
+    "=": lambda a, b: a == b,
+}
+
+
+def _codec(value):
+    """Normalizes a codec name; yt-dlp uses "none" for a missing stream."""
+    return None if value in (None, "none") else value
+
+
+def format_rows(info):
+    """
+    Builds one table row per downloadable format.
+
+    Args:
+        info (dict): Video information from yt-dlp.
+
+    Returns:
+        list: Row dictionaries with id, ext, height, width, fps, vcodec,
+            acodec, tbr, abr, vbr, size, size_estimated and note.
+    """
+    duration = info.get("duration")
+    rows = []
+    for fmt in info.get("formats") or []:
+        vcodec, acodec = _codec(fmt.get("vcodec")), _codec(fmt.get("acodec"))
+        if not fmt.get("format_id") or not (vcodec or acodec) or fmt.get("ext") == "mhtml":
+            continue  # Storyboards and other non-media entries
+        tbr = fmt.get("tbr") or ((fmt.get("vbr") or 0) + (fmt.get("abr") or 0)) or None
+        size = fmt.get("filesize") or fmt.get("filesize_approx")
+        estimated = not fmt.get("filesize")
+        if not size and tbr and duration:
+            size = int(tbr * 1000 / 8 * duration)
+        rows.append({
+            "id": fmt["format_id"],
+            "ext": fmt.get("ext"),
+            "height": fmt.get("height") if vcodec else None,
+            "width": fmt.get("width") if vcodec else None,
+            "fps": fmt.get("fps") if vcodec else None,
+            "vcodec": vcodec,
+            "acodec": acodec,
+            "tbr": tbr,
+            "abr": fmt.get("abr") if acodec else None,
+            "vbr": fmt.get("vbr") if vcodec else None,
+            "size": size or None,
+            "size_estimated": estimated,
+            "note": fmt.get("format_note") or "",
+        })
+    return rows
+
+
+def sort_rows(rows, key="resolution"):
+    """
+    Sorts table rows by one of SORT_KEYS: sizes smallest first, IDs in
+    order, everything else largest first.
+
+    Raises:
+        ValueError: If ``key`` is not a sortable column.
+    """
+    if key not in SORT_KEYS:
+        raise ValueError(f"Cannot sort by {key!r}; use one of: {', '.join(SORT_KEYS)}")
+    return sorted(rows, key=SORT_KEYS[key], reverse=key not in ("size", "id"))
+
+
+def format_size(size, estimated=False):
+    """Formats a byte count for the table, marking estimates with '~'."""
+    if size is None:
+        return "?"
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            text = f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+            return ("~" if estimated else "") + text
+        size /= 1024
+
+
+def _resolution(row):
+    if row["height"] is None:
+        return "audio only"
+    return f"{row['width']}x{row['height']}" if row["width"] else f"{row['height']}p"
+
+
+def print_table(rows):
+    """
+    Prints rows as an aligned table.
+
+    Args:
+        rows (list): Rows from format_rows, already in the order to show.
+    """
+    print(colored(
+        f"{'ID':<10} {'EXT':<5} {'RESOLUTION':<11} {'FPS':>4} {'VCODEC':<13} {'ACODEC':<11} "
+        f"{'KBPS':>6} {'SIZE':>10}  NOTE",
+        "yellow",
+    ))
+    for row in rows:
+        print(
+            colored(f"{row['id']:<10} ", "green")
+            + colored(
+                f"{row['ext'] or '':<5} {_resolution(row):<11} {row['fps'] or '':>4} "
+                f"{(row['vcodec'] or '-')[:13]:<13} {(row['acodec'] or '-')[:11]:<11} "
+                f"{round(row['tbr']) if row['tbr'] else '?':>6} "
+                f"{format_size(row['size'], row['size_estimated']):>10}  {row['note']}",
+                "cyan",
+            )
+        )
+
+
+def parse_constraint(text):
+    """
+    Parses a constraint string (see the module docstring).
+
+    Args:
+        text (str): E.g. "height>=720, size<=300MB".
+
+    Returns:
+        tuple: (audio_only, list of (field, operator, value) terms)
+
+    Raises:
+        ValueError: If a term is not understood.
+    """
+    audio_only = False
+    terms = []
+    # Allow spaces around operators before splitting on whitespace
+    text = re.sub(r"\s*(>=|<=|>|<|=)\s*", r"\1", text.strip().lower())
+    for word in re.split(r"[,\s]+", text):
+        if not word:
+            continue
+        if word == "audio":
+            audio_only = True
+            continue
+        match = _TERM_PATTERN.match(word)
+        if not match:
+            raise ValueError(f"Cannot understand {word!r} in the format constraint")
+        field, operator, value = match.groups()
+        if field in TEXT_FIELDS:
+            if operator != "=":
+                raise ValueError(f"{field} only supports '='")
+        elif field == "size":
+            size = re.fullmatch(r"([0-9.]+)([kmg]?b?)", value)
+            if not size or size.group(2) not in SIZE_UNITS:
+                raise ValueError(f"Cannot understand the size {value!r}")
+            value = float(size.group(1)) * SIZE_UNITS[size.group(2)]
+        elif field in NUMERIC_FIELDS:
+            try:
+                value = float(value)
+            except ValueError:
+                raise ValueError(f"{field} needs a number, not {value!r}") from None
+        else:
+            raise ValueError(f"Unknown field {field!r}; use one of: {', '.join(NUMERIC_FIELDS + TEXT_FIELDS)}")
+        terms.append((field, operator, value))
+    return audio_only, terms
+
+
+def _satisfies(row, terms):
+    for field, operator, value in terms:
+        actual = row[field]
+        if actual is None:
+            return False
+        if field in TEXT_FIELDS:
+            if not str(actual).lower().startswith(value):
+                return False
+        elif not _OPERATORS[operator](actual, value):
+            return False
+    return True
+
+
+def _combine(video, audio):
+    """Builds the row a video-only + audio-only pair would download as."""
+    known = video["size"] is not None and audio["size"] is not None
+    return dict(
+        video,
+        id=f"{video['id']}+{audio['id']}",
+        acodec=audio["acodec"],
+        abr=audio["abr"],
+        tbr=(video["tbr"] or 0) + (audio["tbr"] or 0) or None,
+        size=video["size"] + audio["size"] if known else None,
+        size_estimated=video["size_estimated"] or audio["size_estimated"],
+    )
+
+
+def candidates(rows, audio_only=False):
+    """
+    Lists everything that could be downloaded: audio-only formats, or single
+    formats with video and audio plus every video-only + audio-only pair.
+    """
+    audio = [row for row in rows if row["acodec"] and not row["vcodec"]]
+    if audio_only:
+        return audio
+    muxed = [row for row in rows if row["vcodec"] and row["acodec"]]
+    video = [row for row in rows if row["vcodec"] and not row["acodec"]]
+    return muxed + [_combine(v, a) for v in video for a in audio]
+
+
+def select_smallest(info, constraint):
+    """
+    Picks the smallest format (or video + audio pair) meeting a constraint.
+
+    Args:
+        info (dict): Video information from yt-dlp.
+        constraint (str): Constraint string, see parse_constraint.
+
+    Returns:
+        dict: The chosen row; its 'id' is a yt-dlp format selector. None if
+            no format meets the constraint.
+
+    Raises:
+        ValueError: If the constraint is not understood.
+    """
+    audio_only, terms = parse_constraint(constraint)
+    matching = [row for row in candidates(format_rows(info), audio_only) if _satisfies(row, terms)]
+    if not matching:
+        return None
+    # Formats of unknown size go last; among equal sizes prefer the lower bitrate
+    return min(matching, key=lambda row: (row["size"] is None, row["size"] or 0, row["tbr"] or 0))
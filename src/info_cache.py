@@ -0,0 +1,183 @@
+"""
+On-disk cache of extracted video information, keyed by YouTube video ID.
+
+A yt-dlp extraction takes seconds; reading a cached entry takes milliseconds.
+Every part of the app that extracts a single video stores the result here,
+so the downloader, the audio player and the format table share them.
+
+Two lifetimes apply to an entry:
+
+- Metadata (title, uploader, duration, the format list) is trusted for
+  INFO_CACHE_TTL_HOURS.
+- Stream URLs inside the formats expire much sooner (YouTube signs them for a
+  few hours). Their expiry is read from the URLs and tracked separately, so a
+  caller that only shows metadata can still use an entry whose streams are no
+  longer valid.
+
+Entries are extracted under an optional profile (e.g. "segmented" for the
+downloader's fragment-friendly formats); lookups that need stream URLs only
+accept their own profile. Each entry is one gzip-compressed JSON file in
+INFO_CACHE_DIR, with bulky fields nobody here uses (captions, heatmaps)
+stripped; the most recently used entries are also kept in memory.
+"""
+import copy
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import yt_dlp
+from constants import INFO_CACHE_DIR, STREAM_CACHE_DEFAULT_TTL, STREAM_CACHE_REFRESH_MARGIN
+from stream_cache import get_expiry
+
+# How long metadata stays valid
+INFO_CACHE_TTL = float(os.getenv("INFO_CACHE_TTL_HOURS", "24")) * 3600
+# Entries kept on disk; the least recently written are removed beyond this
+INFO_CACHE_MAX_ENTRIES = int(os.getenv("INFO_CACHE_MAX_ENTRIES", "500"))
+# Entries also kept in memory for repeated lookups
+MEMORY_ENTRIES = 16
+# Fields that make up most of an info dict and are never read by the app
+DROPPED_FIELDS = ("automatic_captions", "subtitles", "heatmap", "storyboards")
+
+_lock = threading.Lock()
+_memory = OrderedDict()  # key -> entry, most recently used last
+
+
+def _key(video_id, profile):
+    return video_id if profile is None else f"{video_id}@{profile}"
+
+
+def _path(key):
+    return os.path.join(INFO_CACHE_DIR, f"{key}.json.gz")
+
+
+def stream_expiry(info):
+    """
+    Returns when the first stream URL in an info dict expires.
+
+    Args:
+        info (dict): Video information from yt-dlp.
+
+    Returns:
+        float: Unix timestamp.
+    """
+    expiries = [get_expiry(fmt["url"]) for fmt in info.get("formats") or [] if fmt.get("url")]
+    expiries = [expiry for expiry in expiries if expiry]
+    return min(expiries) if expiries else time.time() + STREAM_CACHE_DEFAULT_TTL
+
+
+def streams_fresh(info):
+    """Returns True if the stream URLs of an info dict can still be downloaded from."""
+    return stream_expiry(info) - STREAM_CACHE_REFRESH_MARGIN > time.time()
+
+
+def _read(key):
+    """Returns a cache entry from memory or disk, or None. Caller holds the lock."""
+    entry = _memory.get(key)
+    if entry is not None:
+        _memory.move_to_end(key)
+        return entry
+    try:
+        with gzip.open(_path(key), "rt", encoding="utf-8") as file:
+            entry = json.load(file)
+    except (OSError, ValueError, EOFError):
+        return None
+    _remember(key, entry)
+    return entry
+
+
+def _remember(key, entry):
+    """Keeps an entry in memory. Caller holds the lock."""
+    _memory[key] = entry
+    _memory.move_to_end(key)
+    while len(_memory) > MEMORY_ENTRIES:
+        _memory.popitem(last=False)
+
+
+def _remove(key):
+    """Drops an entry. Caller holds the lock."""
+    _memory.pop(key, None)
+    try:
+        os.remove(_path(key))
+    except OSError:
+        pass
+
+
+def get(video_id, profile=None, need_streams=True):
+    """
+    Looks up the cached information of a video.
+
+    Args:
+        video_id (str): YouTube video ID.
+        profile (str): Extraction profile the caller uses (None for plain extraction).
+        need_streams (bool): Only return an entry whose stream URLs are still
+            valid. With False, an entry of any profile is accepted as long as
+            its metadata is fresh.
+
+    Returns:
+        dict: A copy of the video information, or None on a miss.
+    """
+    if not video_id:
+        return None
+    own_key = _key(video_id, profile)
+    keys = [own_key]
+    now = time.time()
+    with _lock:
+        if not need_streams:
+            for path in glob.glob(os.path.join(INFO_CACHE_DIR, f"{glob.escape(video_id)}*.json.gz")):
+                key = os.path.basename(path)[: -len(".json.gz")]
+                if key not in keys and key.split("@")[0] == video_id:
+                    keys.append(key)
+        for key in keys:
+            entry = _read(key)
+            if entry is None:
+                continue
+            if entry["fetched_at"] + INFO_CACHE_TTL <= now:
+                _remove(key)
+                continue
+            if need_streams and entry["streams_expire_at"] - STREAM_CACHE_REFRESH_MARGIN <= now:
+                continue
+            return copy.deepcopy(entry["info"])
+    return None
+
+
+def store(info, profile=None):
+    """
+    Caches the information of a single video.
+
+    Args:
+        info (dict): Video information from yt-dlp (playlists and other sites
+            are ignored).
+        profile (str): Extraction profile the information was extracted under.
+    """
+    if not info or info.get("_type", "video") != "video" or info.get("extractor_key") != "Youtube":
+        return
+    info = yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=True)
+    for field in DROPPED_FIELDS:
+        info.pop(field, None)
+    entry = {"fetched_at": time.time(), "streams_expire_at": stream_expiry(info), "info": info}
+    key = _key(info["id"], profile)
+    with _lock:
+        _remember(key, entry)
+        try:
+            os.makedirs(INFO_CACHE_DIR, exist_ok=True)
+            temp_file = _path(key) + ".tmp"
+            with gzip.open(temp_file, "wt", encoding="utf-8", compresslevel=6) as file:
+                json.dump(entry, file, separators=(",", ":"))
+            os.replace(temp_file, _path(key))
+            _prune()
+        except OSError:
+            # The entry is still cached in memory for this session
+            pass
+
+
+def _prune():
+    """Removes the oldest files beyond INFO_CACHE_MAX_ENTRIES. Caller holds the lock."""
+    paths = glob.glob(os.path.join(INFO_CACHE_DIR, "*.json.gz"))
+    if len(paths) <= INFO_CACHE_MAX_ENTRIES:
+        return
+    paths.sort(key=lambda path: os.path.getmtime(path))
+    for path in paths[: len(paths) - INFO_CACHE_MAX_ENTRIES]:
+        _remove(os.path.basename(path)[: -len(".json.gz")])
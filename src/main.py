@@ -6,6 +6,7 @@ from termcolor import colored
 from colorama import init
 from song_save import music_library
 from audio_player import input_url_for_audio
+from stream_quality import quality_menu
 from video_downloader import input_url_for_video
 from qr_code import qr_menu as qr
 from yt_access_control import yt_access_menu as yt_access
@@ -39,7 +40,8 @@ def song_menu():
             print(colored("\n--------------------------------\n", "yellow"))
             print(colored("1. Saved Songs", "green"))
             print(colored("2. Play a Song from YouTube", "green"))
-            print(colored("3. Exit", "green"))
+            print(colored("3. Streaming Quality", "green"))
+            print(colored("4. Exit", "green"))
             song_choice = input(colored("Enter your choice: ", "yellow"))
             if song_choice == "1":
                 # Navigate to the music library to manage and play saved songs
@@ -51,6 +53,9 @@ def song_menu():
                 except Exception as e:
                     print(colored(e, "red"))
             elif song_choice == "3":
+                # Choose the bitrate cap for streamed songs
+                quality_menu()
+            elif song_choice == "4":
                 # Exit the song menu
                 break
             else:
@@ -0,0 +1,64 @@
+"""
+Offline warm-up of saved playlists into the local audio cache.
+
+Every song is resolved and downloaded through a bounded worker pool and pinned
+in the audio cache, which the players read from before going to the network.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from termcolor import colored
+import audio_cache
+from utils import extract_video_id
+
+# Number of songs downloaded in parallel during an offline warm-up
+OFFLINE_WORKERS = int(os.getenv("OFFLINE_WORKERS", "3"))
+
+
+def print_progress(ready, failed, total, last_name):
+    """Redraws the single warm-up progress line."""
+    remaining = total - ready - len(failed)
+    line = f"Offline: {ready}/{total} ready | {len(failed)} failed | {remaining} left | {last_name[:40]}"
+    print("\r" + colored(line.ljust(100), "cyan"), end="", flush=True)
+
+
+def warm_up(songs, workers=OFFLINE_WORKERS):
+    """
+    Downloads every song into the audio cache and pins it for offline listening.
+
+    Args:
+        songs (list): Song dictionaries with 'name' and 'url' keys.
+        workers (int): Number of parallel downloads.
+
+    Returns:
+        tuple: (number of songs available offline, list of songs that failed)
+    """
+    total = len(songs)
+    ready = 0
+    failed = []
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="offline")
+    try:
+        futures = {executor.submit(audio_cache.fetch, song["url"], True): song for song in songs}
+        print_progress(ready, failed, total, "")
+        for future in as_completed(futures):
+            song = futures[future]
+            if future.result():
+                ready += 1
+            else:
+                failed.append(song)
+            print_progress(ready, failed, total, song["name"])
+    except KeyboardInterrupt:
+        print(colored("\nOffline download canceled by the user.", "red"))
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        print()
+    return ready, failed
+
+
+def release(songs):
+    """
+    Releases songs from offline pinning so the cache may evict them again.
+
+    Args:
+        songs (list): Song dictionaries with a 'url' key.
+    """
+    audio_cache.set_pinned([extract_video_id(song["url"]) for song in songs], False)
@@ -0,0 +1,469 @@
+"""
+Asynchronous controller for the interactive audio players.
+
+Keystrokes, stream URL resolution, prefetching and libvlc events all arrive on
+one asyncio event loop. Nothing waits on input(), so the player reacts to a
+track ending or a key press as soon as it happens and keeps a status line with
+the playback position, volume and next track up to date in between.
+"""
+import asyncio
+import os
+import sys
+import bandwidth
+import stream_cache
+from termcolor import colored
+from console_input import CommandReader
+from playlist_stream import PlaylistStream
+from prefetch import TrackPrefetcher
+from utils import extract_video_id, format_duration
+
+# Seconds between status line redraws
+STATUS_INTERVAL = float(os.getenv("STATUS_INTERVAL", "0.5"))
+VOLUME_STEP = 10  # Percent per +/- key press
+
+QUIT = object()  # Returned by key handlers when the user leaves the player
+
+
+# Function to check whether a track exists, waiting for lazily loaded playlists
+def has_track(tracks, index):
+    """
+    Returns True if ``tracks`` has an entry at ``index``.
+
+    For a PlaylistStream this waits until that entry has loaded or the whole
+    playlist has been read.
+    """
+    if isinstance(tracks, PlaylistStream):
+        return tracks.wait_for(index)
+    return index < len(tracks)
+
+
+class PlayerController:
+    """
+    Plays tracks on the shared engine and handles keys and player events as they arrive.
+
+    In playlist mode the controller advances as soon as libvlc reports the end
+    of a track. In gapless mode the next track is opened and buffered on the
+    engine's standby player shortly before the current one ends, and playback
+    hands over to it without a gap. In single mode one song is played with the
+    simpler song controls and the player stays open after it finishes.
+
+    Args:
+        engine (PlayerEngine): The shared playback engine.
+        tracks (list): Track dictionaries with 'title' and 'url' keys, or a
+            PlaylistStream that is still loading.
+        resolve (callable): Maps a track URL to a playable stream URL or local
+            file (or None); called with ``quiet=True`` on worker threads.
+        start_index (int): The index of the track to start playing from.
+        gapless (bool): Preload the next track and hand over without a gap.
+        crossfade (float): Seconds to crossfade between tracks in gapless mode.
+        single (bool): Play one song with the single song controls.
+        on_play (callable): Called with a track's URL once it starts playing.
+    """
+
+    def __init__(
+        self, engine, tracks, resolve, start_index=0, gapless=False, crossfade=0, single=False, on_play=None
+    ):
+        self.engine = engine
+        self.tracks = tracks
+        self.resolve = resolve
+        self.on_play = on_play
+        self.index = start_index
+        self.gapless = gapless and not single
+        self.crossfade = crossfade if self.gapless else 0
+        self.single = single
+        self.auto_next = True  # Automatically play next song when current ends
+        self.paused = False
+        self.number_entry = None  # ("volume" or "jump", digits) while a number is typed after V or J
+        self.generation = None  # Engine generation of the track that is playing
+        self.preloaded = None  # (index, stream URL) of the track buffered on the standby player
+        self.handoff = 0  # Crossfade seconds for starting the next track
+        self.prefetcher = TrackPrefetcher(resolve)
+        self.live_status = sys.stdout.isatty()
+        self._status = ""
+        self._loop = None
+        self._events = None
+        self._tasks = set()  # Background tasks, referenced so they are not garbage collected
+
+    async def run(self):
+        """
+        Plays until the end of the tracks or until the user quits.
+
+        Returns:
+            bool: True if the end of the list was reached, False if the user exited.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._events = asyncio.Queue()
+        reader = CommandReader(self._post_key)
+        self.engine.crossfade = self.crossfade
+        self.engine.listener = self._post_player_event
+        reader.start()
+        status_task = asyncio.create_task(self._refresh_status())
+        try:
+            return await self._play_all()
+        finally:
+            status_task.cancel()
+            for task in list(self._tasks):
+                task.cancel()
+            self.engine.listener = None
+            self.engine.crossfade = 0
+            self.engine.discard_preload()
+            bandwidth.set_streaming(False)  # Also after the last track ended on its own
+            reader.stop()
+            self.prefetcher.close()
+            self._clear_status()
+
+    def _post_key(self, key):
+        """Hands a key from the reader thread to the event loop."""
+        self._post(("key", key))
+
+    def _post_player_event(self, kind, generation):
+        """Hands a libvlc event from a libvlc thread to the event loop."""
+        self._post((kind, generation))
+
+    def _post(self, event):
+        try:
+            self._loop.call_soon_threadsafe(self._events.put_nowait, event)
+        except RuntimeError:
+            pass  # The loop has already closed; the player is gone
+
+    def _spawn(self, coroutine):
+        """Runs ``coroutine`` as a background task on the loop."""
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _has_track(self, index):
+        if isinstance(self.tracks, PlaylistStream):
+            return await self._loop.run_in_executor(None, has_track, self.tracks, index)
+        return has_track(self.tracks, index)
+
+    async def _resolve(self, url):
+        """Returns the playable source for a track, reusing a prefetched one."""
+        return await asyncio.wrap_future(self.prefetcher.submit(url))
+
+    async def _while_handling_keys(self, awaitable):
+        """
+        Awaits a slow lookup (a playlist page or a track's stream URL) while
+        still handling keys, so the user can skip ahead or quit during retries.
+
+        Returns:
+            tuple: (True, result) once the lookup finishes, or (False, outcome)
+                if a key left the track first; outcome is a track index or QUIT.
+        """
+        task = asyncio.ensure_future(awaitable)
+        try:
+            while True:
+                getter = asyncio.ensure_future(self._events.get())
+                done, _ = await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    return True, task.result()
+                kind, value = getter.result()
+                if kind != "key":
+                    continue  # Late event from a track we already left
+                command = (value or "").strip().lower()
+                if self.number_entry is None and command in ("r", "p" if self.single else "c"):
+                    continue  # Nothing is playing to restart or pause
+                outcome = self._on_key(value)
+                if outcome is not None:
+                    return False, outcome
+                self._draw_status()
+        finally:
+            # A resolution that has not started yet frees its prefetch worker
+            task.cancel()
+
+    def _quit(self):
+        """Stops playback on the way out of the player; returns False for run()."""
+        self.engine.stop()
+        self._print(colored("Exiting player.", "red"))
+        return False
+
+    async def _play_all(self):
+        if not self.single:
+            # Resolve the first tracks in parallel so early skips do not wait
+            self.prefetcher.prefetch_around(self.tracks, self.index)
+        while True:
+            ready, result = await self._while_handling_keys(self._has_track(self.index))
+            if not ready:
+                if result is QUIT:
+                    return self._quit()
+                self.index = result
+                continue
+            if not result:
+                return True
+            track = self.tracks[self.index]
+            if not self.single:
+                total = self.tracks.count_label() if isinstance(self.tracks, PlaylistStream) else len(self.tracks)
+                self._print(colored(f"\n--- Playing {self.index + 1}/{total}: {track['title']} ---", "green"))
+
+            # Usually already resolved by the prefetcher
+            if self.preloaded and self.preloaded[0] == self.index:
+                audio_url = self.preloaded[1]
+            else:
+                ready, result = await self._while_handling_keys(self._resolve(track["url"]))
+                if not ready:
+                    if result is QUIT:
+                        return self._quit()
+                    self.index = result
+                    continue
+                audio_url = result
+            self.preloaded = None
+            if not audio_url:
+                if self.single:
+                    self._print(colored("Could not fetch the audio URL. Aborting...", "red"))
+                    await asyncio.sleep(2)
+                    return False
+                self._print(colored(f"Skipping {track['title']} - could not fetch audio", "red"))
+                self.index += 1
+                continue
+
+            try:
+                self.generation = self.engine.play(audio_url, crossfade=self.handoff)
+            except Exception as e:
+                self._print(colored(f"Error playing {track['title']}: {e}", "red"))
+                if self.single:
+                    return False
+                self.index += 1
+                continue
+            self.handoff = 0
+            self.paused = False
+            if self.on_play:
+                self.on_play(track["url"])
+            if not self.single:
+                self.prefetcher.prefetch_after(self.tracks, self.index)
+            self._print_controls()
+
+            next_index = await self._control_track(track)
+            if next_index is QUIT:
+                return False
+            self.index = next_index
+
+    async def _control_track(self, track):
+        """
+        Handles keys and player events until the current track is left.
+
+        Returns:
+            int: The index of the track to play next, or QUIT.
+        """
+        while True:
+            kind, value = await self._events.get()
+
+            if kind == "key":
+                outcome = self._on_key(value)
+                if outcome is None:
+                    self._draw_status()  # Show the effect of the key without waiting for the next refresh
+                    continue
+                if outcome is QUIT:
+                    self._quit()
+                else:
+                    self.engine.stop()
+                return outcome
+
+            if value != self.generation:
+                continue  # Late event from a track we already left
+
+            if kind == "near_end":
+                if self.gapless and self.auto_next:
+                    self._spawn(self._preload(self.index + 1, self.generation))
+            elif kind == "fade":
+                if self.auto_next and self.preloaded and self.preloaded[0] == self.index + 1:
+                    self._print(colored("\nCrossfading into next song...", "yellow"))
+                    self.handoff = self.crossfade
+                    return self.index + 1  # The engine fades the current track out itself
+            elif kind == "error":
+                self._print(colored(f"\nPlayback error on {track['title']}, skipping...", "red"))
+                stream_cache.invalidate(extract_video_id(track["url"]))
+                self.engine.stop()
+                return QUIT if self.single else self.index + 1
+            elif kind == "ended":
+                if self.single:
+                    self._print(colored("\nSong finished. Press R to play it again or Q to quit.", "yellow"))
+                elif self.auto_next:
+                    self._print(colored("\nSong finished, playing next song...", "yellow"))
+                    return self.index + 1
+                else:
+                    self._print(colored("\nSong finished. Press N for next or R to play it again.", "yellow"))
+
+    async def _preload(self, index, generation):
+        """Resolves the track at ``index`` and buffers it on the standby player."""
+        if index >= len(self.tracks):
+            return
+        next_url = await self._resolve(self.tracks[index]["url"])
+        # Only preload if the user has not moved on while it was resolving
+        if next_url and generation == self.generation:
+            self.engine.preload(next_url)
+            self.preloaded = (index, next_url)
+
+    def _on_key(self, key):
+        """
+        Applies one key press.
+
+        Returns:
+            The index of the track to switch to, QUIT, or None to keep playing.
+        """
+        if key is None:
+            return QUIT  # Input was closed
+        if self.number_entry is not None:
+            return self._on_number_key(key)
+        command = key.strip().lower()
+        if not command:
+            return None
+
+        if command == "q":
+            return QUIT
+        if command == "r":
+            self.generation = self.engine.restart()
+            self.paused = False
+            self._print(colored("Song restarted.", "magenta"))
+        elif command in ("+", "-"):
+            step = VOLUME_STEP if command == "+" else -VOLUME_STEP
+            self.engine.set_volume(self.engine.volume + step)
+        elif command == ("p" if self.single else "c"):
+            self.paused = self.engine.toggle_pause()
+        elif self.single:
+            self._print("Invalid command. Try again.")
+        elif command == "n":
+            self._print(colored("Moving to next song.", "green"))
+            return self.index + 1
+        elif command == "p":
+            if self.index > 0:
+                self._print(colored("Moving to previous song.", "blue"))
+                return self.index - 1
+            self._print(colored("Already at the first song.", "yellow"))
+        elif command == "a":
+            self.auto_next = not self.auto_next
+            if self.auto_next:
+                self._print(colored("Auto next enabled. Will play next song automatically.", "green"))
+            else:
+                self.engine.discard_preload()
+                self.preloaded = None
+                self._print(colored("Auto next disabled. You'll need to press N for next song.", "red"))
+        elif command == "v":
+            self.number_entry = ("volume", "")
+            if not self.live_status:
+                self._print(colored("Enter new volume (0-100) and press Enter: ", "yellow"))
+        elif command == "j":
+            self.number_entry = ("jump", "")
+            if not self.live_status:
+                self._print(colored("Enter the song number to jump to and press Enter: ", "yellow"))
+        else:
+            self._print("Invalid command. Try again.")
+        return None
+
+    def _on_number_key(self, key):
+        """
+        Collects the digits typed after V or J; Enter applies them, any other key cancels.
+
+        Returns:
+            The index of the track to jump to, or None.
+        """
+        purpose, digits = self.number_entry
+        if key.isdigit() and len(digits) < 5:
+            self.number_entry = (purpose, digits + key)
+            return None
+        if key in ("\b", "\x7f"):
+            self.number_entry = (purpose, digits[:-1])
+            return None
+        self.number_entry = None
+        if key not in ("\r", "\n") or not digits:
+            return None
+        number = int(digits)
+        if purpose == "jump":
+            return self._jump(number - 1)
+        if 0 <= number <= 100:
+            self.engine.set_volume(number)
+            self._print(colored(f"Volume set to {number}%.", "cyan"))
+        else:
+            self._print(colored("Invalid volume level. Please enter a number between 0 and 100.", "red"))
+        return None
+
+    def _jump(self, target):
+        """
+        Starts resolving the tracks around ``target`` and returns it if it exists.
+
+        Tracks of a playlist that is still loading are accepted up to the count
+        YouTube reported for it.
+        """
+        if isinstance(self.tracks, PlaylistStream) and not self.tracks.complete:
+            limit = self.tracks.expected_count or target + 1
+        else:
+            limit = len(self.tracks)
+        if not 0 <= target < limit:
+            self._print(colored(f"There is no song {target + 1} in this playlist.", "red"))
+            return None
+        self.prefetcher.prefetch_around(self.tracks, target)
+        self._print(colored(f"Jumping to song {target + 1}.", "green"))
+        return target
+
+    def _print_controls(self):
+        if self.single:
+            self._print(
+                colored("\nControls: ", "yellow")
+                + colored("[P] Pause/Resume | ", "cyan")
+                + colored("[R] Restart | ", "green")
+                + colored("[Q] Quit | ", "red")
+                + colored("[+] Increase Volume | ", "magenta")
+                + colored("[-] Decrease Volume", "magenta")
+            )
+            return
+        auto_status = "ON" if self.auto_next else "OFF"
+        auto_color = "green" if self.auto_next else "red"
+        self._print(
+            colored("\nPlaylist Controls: ", "yellow")
+            + colored("[N] Next Song | ", "green")
+            + colored("[P] Previous Song | ", "blue")
+            + colored("[C] Pause/Resume | ", "cyan")
+            + colored("[R] Restart Song | ", "magenta")
+            + colored(f"[A] Auto Next: {auto_status} | ", auto_color)
+            + colored("[J] Jump To Song | ", "green")
+            + colored("[+/-/V] Volume | ", "cyan")
+            + colored("[Q] Exit Playlist", "red")
+        )
+
+    def _status_text(self):
+        """Builds the status line: position, volume, pause state and next track."""
+        length = self.engine.get_length()
+        parts = [
+            f"{format_duration(self.engine.get_time())} / {format_duration(length) if length else '--:--'}",
+            f"Volume {self.engine.volume}%",
+        ]
+        if self.paused:
+            parts.append("Paused")
+        if not self.single:
+            if self.index + 1 < len(self.tracks):
+                parts.append(f"Next: {self.tracks[self.index + 1]['title']}")
+            elif isinstance(self.tracks, PlaylistStream) and not self.tracks.complete:
+                parts.append("Next: loading...")
+            else:
+                parts.append("Last song")
+        if self.number_entry is not None:
+            purpose, digits = self.number_entry
+            parts.append(f"{'Jump to song' if purpose == 'jump' else 'New volume'}: {digits}_")
+        return " | ".join(parts)
+
+    def _draw_status(self, force=False):
+        if not self.live_status:
+            return
+        text = self._status_text()
+        if text != self._status or force:
+            self._status = text
+            sys.stdout.write("\r\033[K" + colored(text, "cyan"))
+            sys.stdout.flush()
+
+    def _clear_status(self):
+        if self.live_status and self._status:
+            sys.stdout.write("\r\033[K")
+            sys.stdout.flush()
+            self._status = ""
+
+    def _print(self, text):
+        """Prints a message above the status line and redraws it."""
+        self._clear_status()
+        print(text)
+        self._draw_status(force=True)
+
+    async def _refresh_status(self):
+        """Redraws the status line at most every STATUS_INTERVAL seconds."""
+        while True:
+            self._draw_status()
+            await asyncio.sleep(STATUS_INTERVAL)
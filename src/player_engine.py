@@ -0,0 +1,329 @@
+"""
+Shared libvlc playback engine.
+
+One vlc.Instance and its media players live for the whole session; tracks are
+swapped with set_media() so plugins, audio outputs and caches are loaded once.
+"""
+import os
+import time
+import threading
+from termcolor import colored
+import bandwidth
+from stream_quality import record_throughput
+
+# Milliseconds of streamed audio libvlc buffers before and during playback
+NETWORK_CACHING = int(os.getenv("VLC_NETWORK_CACHING", "1000"))
+# Milliseconds of buffering for local files
+FILE_CACHING = int(os.getenv("VLC_FILE_CACHING", "300"))
+DEFAULT_VOLUME = 50
+# Seconds before the end of a track at which the next one is opened and buffered
+PRELOAD_SECONDS = float(os.getenv("PRELOAD_SECONDS", "15"))
+# Play playlists gaplessly by handing off to a preloaded player
+GAPLESS_PLAYBACK = os.getenv("GAPLESS_PLAYBACK", "1") == "1"
+# Seconds of crossfade between playlist tracks in gapless mode (0 disables it)
+CROSSFADE_SECONDS = float(os.getenv("CROSSFADE_SECONDS", "0"))
+
+_engine = None
+
+
+def build_options():
+    """
+    Builds the libvlc command line options for the shared instance.
+
+    Returns:
+        list: Options passed to vlc.Instance.
+    """
+    return [
+        "--no-video",
+        "--quiet",
+        f"--network-caching={NETWORK_CACHING}",
+        f"--file-caching={FILE_CACHING}",
+    ]
+
+
+class PlayerEngine:
+    """
+    Owns the libvlc instance and players and keeps volume across tracks.
+
+    Besides the active player the engine keeps a standby player that can open
+    and buffer the next track while the current one is still playing. Starting
+    a preloaded track swaps the two players, optionally with a crossfade, so
+    playlists continue without a gap.
+
+    Player events are forwarded to ``listener`` as ``listener(kind, generation)``
+    where generation identifies the track that raised the event and kind is one
+    of "ended", "error", "near_end" (remaining time has dropped below
+    ``preload_lead`` plus ``crossfade``) or "fade" (remaining time has dropped
+    below ``crossfade``).
+
+    Args:
+        vlc (module): The imported vlc module.
+        options (list): libvlc command line options.
+    """
+
+    def __init__(self, vlc, options):
+        self.vlc = vlc
+        self.instance = vlc.Instance(options)
+        self.volume = DEFAULT_VOLUME
+        self.generation = 0
+        self.listener = None
+        self.preload_lead = PRELOAD_SECONDS
+        self.crossfade = 0
+        self.current_mrl = None
+        self.preloaded_mrl = None
+        self._state = {}  # Per-player generation, length and announced events
+        self._fade_thread = None
+        self._fade_abort = threading.Event()
+        self.player = self._new_player()
+        self.standby = None
+
+    def _new_player(self):
+        """Creates a media player wired to the engine's event handlers."""
+        player = self.instance.media_player_new()
+        events = self.vlc.EventType
+        event_manager = player.event_manager()
+        event_manager.event_attach(events.MediaPlayerEndReached, self._forward, "ended", player)
+        event_manager.event_attach(events.MediaPlayerEncounteredError, self._forward, "error", player)
+        event_manager.event_attach(events.MediaPlayerLengthChanged, self._on_length, player)
+        event_manager.event_attach(events.MediaPlayerTimeChanged, self._on_time, player)
+        event_manager.event_attach(events.MediaPlayerPaused, self._on_paused, player)
+        self._reset_state(player, None)
+        return player
+
+    def _reset_state(self, player, generation):
+        """Forgets what is known about the media on ``player``."""
+        self._state[player] = {
+            "generation": generation,
+            "length": 0,
+            "announced": set(),
+            "buffered": False,
+            "opened_at": None,  # When a network stream started buffering, until measured
+        }
+
+    def _forward(self, event, kind, player):
+        """Relays a libvlc event to the current listener (runs on a libvlc thread)."""
+        generation = self._state[player]["generation"]
+        if kind == "error" and player is self.standby:
+            # The preload failed; play() will load the track from scratch instead
+            self.preloaded_mrl = None
+        listener = self.listener
+        if listener and generation is not None:
+            listener(kind, generation)
+
+    def _on_length(self, event, player):
+        """Records the media length reported by libvlc."""
+        self._state[player]["length"] = event.u.new_length
+
+    def _on_paused(self, event, player):
+        """Notes that a preloading player has buffered its media and paused."""
+        self._state[player]["buffered"] = True
+        self._measure_buffering(player)
+
+    def _measure_buffering(self, player):
+        """Reports how fast libvlc filled the buffer of a network stream to the bandwidth meter."""
+        state = self._state[player]
+        opened_at, state["opened_at"] = state["opened_at"], None
+        if opened_at is None:
+            return
+        try:
+            stats = self.vlc.MediaStats()
+            if player.get_media().get_stats(stats):
+                record_throughput(stats.read_bytes, time.monotonic() - opened_at)
+        except (AttributeError, TypeError):
+            pass  # python-vlc without media statistics
+
+    def _on_time(self, event, player):
+        """Announces the preload and crossfade points of the active track once each."""
+        state = self._state[player]
+        if state["opened_at"] is not None:
+            self._measure_buffering(player)  # First position update: the buffer has filled
+        if player is not self.player or not state["length"]:
+            return
+        remaining = (state["length"] - event.u.new_time) / 1000.0
+        if remaining <= self.preload_lead + self.crossfade:
+            self._announce(state, "near_end")
+        if self.crossfade and remaining <= self.crossfade:
+            self._announce(state, "fade")
+
+    def _announce(self, state, kind):
+        """Forwards ``kind`` for a track the first time it happens."""
+        if kind in state["announced"]:
+            return
+        state["announced"].add(kind)
+        listener = self.listener
+        if listener and state["generation"] is not None:
+            listener(kind, state["generation"])
+
+    def _start(self, player, volume):
+        """Assigns a new generation to ``player`` and starts it."""
+        self.generation += 1
+        self._state[player]["generation"] = self.generation
+        self._state[player]["announced"] = set()
+        player.audio_set_volume(volume)
+        player.play()
+        return self.generation
+
+    def play(self, mrl, crossfade=0):
+        """
+        Starts playing a track, reusing the standby player if it was preloaded.
+
+        Args:
+            mrl (str): Stream URL or local file path.
+            crossfade (float): Seconds to fade from the current track into a
+                preloaded one; 0 switches immediately.
+
+        Returns:
+            int: The generation number assigned to this track.
+        """
+        self._finish_fade()
+        self.current_mrl = mrl
+        bandwidth.set_streaming(mrl.startswith(("http://", "https://")))
+        # A standby player that has not finished buffering would pause itself
+        # once ready, so only hand over to one that already has
+        standby_ready = self.standby is not None and self._state[self.standby]["buffered"]
+        if standby_ready and mrl == self.preloaded_mrl:
+            outgoing = self.player
+            self.player, self.standby = self.standby, outgoing
+            self.preloaded_mrl = None
+            if crossfade > 0:
+                generation = self._start(self.player, 0)
+                self._fade_thread = threading.Thread(
+                    target=self._fade, args=(outgoing, self.player, crossfade), daemon=True
+                )
+                self._fade_thread.start()
+            else:
+                generation = self._start(self.player, self.volume)
+                outgoing.stop()
+            return generation
+
+        self.discard_preload()
+        self._set_media(self.player, mrl)
+        return self._start(self.player, self.volume)
+
+    def _set_media(self, player, mrl, *options):
+        """Loads ``mrl`` into ``player`` with optional per-media options."""
+        media = self.instance.media_new(mrl, *options)
+        player.set_media(media)
+        media.release()
+        self._reset_state(player, None)
+        if mrl.startswith(("http://", "https://")):
+            self._state[player]["opened_at"] = time.monotonic()
+
+    def preload(self, mrl):
+        """
+        Opens and buffers the next track on the standby player, paused and muted.
+
+        Args:
+            mrl (str): Stream URL or local file path of the next track.
+        """
+        if mrl == self.preloaded_mrl:
+            return
+        self._finish_fade()
+        if self.standby is None:
+            self.standby = self._new_player()
+        self.standby.stop()
+        self._set_media(self.standby, mrl, ":start-paused")
+        self.standby.audio_set_volume(0)
+        self.standby.play()
+        self.preloaded_mrl = mrl
+
+    def discard_preload(self):
+        """Stops the standby player and forgets what it had buffered."""
+        if self.standby is not None and self.preloaded_mrl:
+            self.standby.stop()
+        self.preloaded_mrl = None
+
+    def _fade(self, outgoing, incoming, seconds):
+        """Ramps ``incoming`` up and ``outgoing`` down, then stops ``outgoing``."""
+        steps = max(1, int(seconds * 20))
+        for step in range(1, steps + 1):
+            if self._fade_abort.wait(seconds / steps):
+                break
+            level = step / steps
+            incoming.audio_set_volume(int(self.volume * level))
+            outgoing.audio_set_volume(int(self.volume * (1 - level)))
+        outgoing.stop()
+        incoming.audio_set_volume(self.volume)
+
+    def _finish_fade(self):
+        """Completes a running crossfade immediately."""
+        if self._fade_thread is not None:
+            self._fade_abort.set()
+            self._fade_thread.join()
+            self._fade_abort.clear()
+            self._fade_thread = None
+
+    def toggle_pause(self):
+        """
+        Pauses if playing, resumes otherwise.
+
+        Returns:
+            bool: True if playback is now paused.
+        """
+        if self.player.is_playing():
+            self.player.pause()
+            return True
+        self.player.play()
+        return False
+
+    def restart(self):
+        """
+        Plays the current track again from the beginning.
+
+        Returns:
+            int: The new generation number of the track; events of the old one are stale.
+        """
+        self._finish_fade()
+        # Reload the media so a track that was preloaded does not start paused again
+        self._set_media(self.player, self.current_mrl)
+        return self._start(self.player, self.volume)
+
+    def stop(self):
+        """Stops playback, keeping the instance and players for the next track."""
+        self._finish_fade()
+        self.player.stop()
+        bandwidth.set_streaming(False)
+
+    def set_volume(self, volume):
+        """
+        Sets the volume for the current and all following tracks.
+
+        Args:
+            volume (int): Volume in percent, clamped to 0-100.
+
+        Returns:
+            int: The volume that was applied.
+        """
+        self.volume = max(0, min(100, volume))
+        self.player.audio_set_volume(self.volume)
+        return self.volume
+
+    def get_time(self):
+        """Returns the playback position in seconds."""
+        return max(0, self.player.get_time()) / 1000.0
+
+    def get_length(self):
+        """Returns the current track length in seconds (0 if unknown)."""
+        return max(0, self.player.get_length()) / 1000.0
+
+
+def get_engine():
+    """
+    Returns the shared playback engine, creating it on first use.
+
+    Returns:
+        PlayerEngine: The engine, or None if VLC is not available.
+    """
+    global _engine
+    if _engine is None:
+        try:
+            import vlc
+
+            _engine = PlayerEngine(vlc, build_options())
+        except (ImportError, OSError, NameError, AttributeError):
+            # python-vlc raises NameError/OSError when the libvlc library is missing
+            print(colored("VLC media player is not available. Cannot play audio.", "red"))
+            print(colored("Please install VLC media player and ensure python-vlc package is properly configured.", "yellow"))
+            time.sleep(3)
+            return None
+    return _engine
@@ -0,0 +1,67 @@
+"""
+On-disk cache of YouTube playlist listings, keyed by playlist ID.
+
+Each playlist is stored as one small JSON file holding its title, uploader and
+the id/title/duration of every entry, so a playlist that was opened before can
+start playing without crawling YouTube again.
+"""
+import json
+import os
+import re
+import time
+from constants import PLAYLIST_CACHE_DIR
+
+
+def _path(playlist_id):
+    """Returns the cache file path for a playlist ID."""
+    safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", playlist_id)
+    return os.path.join(PLAYLIST_CACHE_DIR, f"{safe_id}.json")
+
+
+def load_playlist(playlist_id):
+    """
+    Loads a cached playlist listing.
+
+    Args:
+        playlist_id (str): The YouTube playlist ID.
+
+    Returns:
+        dict: Listing with 'title', 'uploader', 'fetched_at' and 'videos'
+            (each with 'id', 'title' and 'duration'), or None on a miss.
+    """
+    try:
+        with open(_path(playlist_id), "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def save_playlist(playlist_id, title, uploader, videos):
+    """
+    Writes a complete playlist listing to the cache.
+
+    Args:
+        playlist_id (str): The YouTube playlist ID.
+        title (str): Playlist title.
+        uploader (str): Playlist owner.
+        videos (list): Track dictionaries with at least 'id', 'title' and 'duration'.
+    """
+    listing = {
+        "id": playlist_id,
+        "title": title,
+        "uploader": uploader,
+        "fetched_at": time.time(),
+        "videos": [
+            {"id": video["id"], "title": video["title"], "duration": video["duration"]}
+            for video in videos
+        ],
+    }
+    try:
+        os.makedirs(PLAYLIST_CACHE_DIR, exist_ok=True)
+        path = _path(playlist_id)
+        with open(path + ".tmp", "w") as file:
+            json.dump(listing, file, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+    except OSError:
+        # Failing to cache only costs a full fetch next time
+        pass
@@ -0,0 +1,195 @@
+"""
+Lazily loaded YouTube playlists.
+
+yt-dlp fetches playlist pages on demand when the entries of an unprocessed
+result are iterated. PlaylistStream does that iteration on a background thread
+so playback can start as soon as the first page is in. Complete listings are
+kept in the playlist cache; a cached playlist opens instantly and only the
+changed head of the playlist is fetched again in the background.
+"""
+import threading
+import ydl_pool
+from playlist_cache import load_playlist, save_playlist
+from utils import extract_playlist_id
+
+PLAYLIST_OPTIONS = {
+    "quiet": True,
+    "no_warnings": True,  # Suppress warnings
+    "extract_flat": "in_playlist",  # List entries without resolving each video
+}
+
+
+def entry_to_video(entry):
+    """
+    Converts a flat playlist entry into the track dictionary used by the players.
+
+    Args:
+        entry (dict): Flat entry from yt-dlp.
+
+    Returns:
+        dict: Track with 'id', 'title', 'url' and 'duration', or None if the
+            entry has no video ID.
+    """
+    if not entry or not entry.get("id"):
+        return None
+    return {
+        "id": entry["id"],
+        "title": entry.get("title") or "Unknown Title",
+        "url": f"https://youtu.be/{entry['id']}",
+        "duration": entry.get("duration") or 0,
+    }
+
+
+class PlaylistStream:
+    """
+    A playlist whose entries load page by page on a background thread.
+
+    Indexing, slicing and len() cover the entries loaded so far; wait_for()
+    blocks until a given index is available or the playlist has been fully read.
+
+    Args:
+        playlist_url (str): The YouTube playlist URL.
+        use_cache (bool): Serve a cached listing if there is one.
+    """
+
+    def __init__(self, playlist_url, use_cache=True):
+        self.playlist_url = playlist_url
+        self.playlist_id = extract_playlist_id(playlist_url)
+        self.use_cache = use_cache and self.playlist_id is not None
+        self.from_cache = False
+        self.title = "Unknown Playlist"
+        self.uploader = "Unknown"
+        self.expected_count = None  # Total reported by YouTube, if any
+        self.complete = False
+        self.error = None
+        self._videos = []
+        self._changed = threading.Condition()
+        self._ready = threading.Event()
+        self._closed = threading.Event()
+
+    def start(self):
+        """
+        Starts loading and waits until the playlist metadata is known.
+
+        A cached listing is served immediately and refreshed in the background.
+
+        Returns:
+            bool: True if the playlist could be opened, False otherwise.
+        """
+        cached = load_playlist(self.playlist_id) if self.use_cache else None
+        if cached and cached.get("videos"):
+            self.title = cached["title"]
+            self.uploader = cached["uploader"]
+            self._videos = [entry_to_video(video) for video in cached["videos"]]
+            self.expected_count = len(self._videos)
+            self.complete = True
+            self.from_cache = True
+            threading.Thread(
+                target=self._refresh, args=(cached["videos"],), name="playlist-refresh", daemon=True
+            ).start()
+            return True
+        threading.Thread(target=self._load, name="playlist-loader", daemon=True).start()
+        self._ready.wait()
+        return self.error is None or len(self) > 0
+
+    def _load(self):
+        """Extracts the playlist and appends entries as yt-dlp pages through it."""
+        try:
+            with ydl_pool.borrow(PLAYLIST_OPTIONS) as ydl:
+                info = ydl.extract_info(self.playlist_url, download=False, process=False)
+                self.title = info.get("title") or self.title
+                self.uploader = info.get("uploader") or self.uploader
+                self.expected_count = info.get("playlist_count")
+                self._ready.set()
+                for entry in info.get("entries") or []:
+                    if self._closed.is_set():
+                        break
+                    video = entry_to_video(entry)
+                    if video:
+                        with self._changed:
+                            self._videos.append(video)
+                            self._changed.notify_all()
+                else:
+                    # Only complete listings are cached
+                    if self.use_cache:
+                        save_playlist(self.playlist_id, self.title, self.uploader, self[:])
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._changed:
+                self.complete = True
+                self._changed.notify_all()
+            self._ready.set()
+
+    def _refresh(self, cached_videos):
+        """
+        Updates the cached listing from YouTube, fetching only the changed head.
+
+        New entries are read until the first cached entry shows up again. If the
+        merged listing then matches the count YouTube reports, the cached tail is
+        kept as is; otherwise the whole playlist is read again.
+        """
+        try:
+            with ydl_pool.borrow(PLAYLIST_OPTIONS) as ydl:
+                info = ydl.extract_info(self.playlist_url, download=False, process=False)
+                expected = info.get("playlist_count")
+                anchor = cached_videos[0]["id"]
+                fresh = []
+                for entry in info.get("entries") or []:
+                    if self._closed.is_set():
+                        return  # A partial listing must not replace the cached one
+                    video = entry_to_video(entry)
+                    if not video:
+                        continue
+                    if video["id"] == anchor and (
+                        expected is None or len(fresh) + len(cached_videos) == expected
+                    ):
+                        videos = fresh + [entry_to_video(cached) for cached in cached_videos]
+                        break
+                    fresh.append(video)
+                else:
+                    videos = fresh
+                save_playlist(
+                    self.playlist_id,
+                    info.get("title") or self.title,
+                    info.get("uploader") or self.uploader,
+                    videos,
+                )
+        except Exception:
+            # Keep the cached listing; the next open will try again
+            pass
+
+    def wait_for(self, index):
+        """
+        Blocks until the entry at ``index`` is loaded or loading has finished.
+
+        Args:
+            index (int): Position in the playlist.
+
+        Returns:
+            bool: True if the entry exists.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: index < len(self._videos) or self.complete)
+            return index < len(self._videos)
+
+    def wait_complete(self):
+        """Blocks until every entry has been loaded."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.complete)
+
+    def close(self):
+        """Stops loading further pages."""
+        self._closed.set()
+
+    def count_label(self):
+        """Returns the number of loaded entries, marked with '+' while loading."""
+        return f"{len(self)}" if self.complete else f"{len(self)}+"
+
+    def __len__(self):
+        with self._changed:
+            return len(self._videos)
+
+    def __getitem__(self, index):
+        with self._changed:
+            return self._videos[index]
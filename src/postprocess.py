@@ -0,0 +1,148 @@
+"""
+Post-processing stage of the downloader, run in a pool of worker processes.
+
+Download workers fetch the raw files a job needs (e.g. the video and the audio
+format of a "137+140" download) and hand them over here, so ffmpeg merges,
+remuxes, audio extraction and thumbnail embedding run on other cores while
+the download threads move on to the next video. The hand-over is bounded:
+once POSTPROCESS_QUEUE tasks are waiting, download workers block until one
+finishes, so raw files cannot pile up faster than they are processed.
+
+The steps are yt-dlp's own ffmpeg post-processors, run in the worker process:
+
+    merge                   Combine the downloaded formats into one file
+    remux:<ext>             Change the container without re-encoding, e.g. remux:mp4
+    extract_audio[:<codec>] Keep only the audio, e.g. extract_audio:mp3 (default: best)
+    embed_thumbnail         Embed the video's thumbnail as cover art
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from utils import SilentLogger
+
+# Worker processes for post-processing (0 = post-process in the download thread)
+POSTPROCESS_WORKERS = int(os.getenv("POSTPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Tasks that may wait for a post-processing worker before downloads pause
+POSTPROCESS_QUEUE = int(os.getenv("POSTPROCESS_QUEUE", "4"))
+
+STEP_NAMES = ("merge", "remux", "extract_audio", "embed_thumbnail")
+AUDIO_CODECS = ("best", "aac", "alac", "flac", "m4a", "mp3", "opus", "vorbis", "wav")
+
+_ydl = None  # Per-process YoutubeDL the post-processors report through
+
+
+def parse_step(step):
+    """
+    Validates a post-processing step.
+
+    Args:
+        step (str): E.g. "remux:mp4" or "embed_thumbnail".
+
+    Returns:
+        str: The normalized step.
+
+    Raises:
+        ValueError: If the step is not understood.
+    """
+    name, _, argument = step.strip().lower().partition(":")
+    if name not in STEP_NAMES:
+        raise ValueError(f"Unknown post-processing step {step!r}; use one of: {', '.join(STEP_NAMES)}")
+    if name == "remux" and not argument:
+        raise ValueError("remux needs a container, e.g. remux:mp4")
+    if name == "extract_audio" and argument and argument not in AUDIO_CODECS:
+        raise ValueError(f"Unknown audio codec {argument!r}; use one of: {', '.join(AUDIO_CODECS)}")
+    return f"{name}:{argument}" if argument else name
+
+
+def _postprocessor(step):
+    """Creates the yt-dlp post-processor for a step."""
+    from yt_dlp.postprocessor import (
+        EmbedThumbnailPP,
+        FFmpegExtractAudioPP,
+        FFmpegMergerPP,
+        FFmpegVideoRemuxerPP,
+    )
+
+    name, _, argument = step.partition(":")
+    if name == "merge":
+        return FFmpegMergerPP(_ydl)
+    if name == "remux":
+        return FFmpegVideoRemuxerPP(_ydl, preferedformat=argument)
+    if name == "extract_audio":
+        return FFmpegExtractAudioPP(_ydl, preferredcodec=argument or "best")
+    return EmbedThumbnailPP(_ydl)
+
+
+def run_steps(task):
+    """
+    Runs a task's post-processing steps; called in a worker process.
+
+    Args:
+        task (dict): {"steps": [...], "info": video information whose
+            'filepath' is the file to process ('__files_to_merge' and
+            'requested_formats' for merges, 'thumbnails' with a 'filepath'
+            for embedding)}.
+
+    Returns:
+        str: Path of the finished file.
+
+    Raises:
+        yt_dlp.utils.PostProcessingError: If ffmpeg is missing or fails.
+    """
+    global _ydl
+    if _ydl is None:
+        import yt_dlp
+
+        _ydl = yt_dlp.YoutubeDL({"quiet": True, "no_warnings": True, "logger": SilentLogger()})
+    info = dict(task["info"])
+    info.setdefault("__files_to_move", {})
+    obsolete = []
+    for step in task["steps"]:
+        files_to_delete, info = _postprocessor(step).run(info)
+        obsolete.extend(files_to_delete)
+    for path in obsolete:
+        if path != info["filepath"]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return info["filepath"]
+
+
+class PostProcessor:
+    """
+    Bounded hand-over from download threads to post-processing processes.
+
+    Args:
+        workers (int): Worker processes.
+        queue_size (int): Tasks that may wait for a worker; submit() blocks
+            while this many are waiting.
+    """
+
+    def __init__(self, workers=POSTPROCESS_WORKERS, queue_size=POSTPROCESS_QUEUE):
+        self.executor = ProcessPoolExecutor(max_workers=max(1, workers))
+        # Running tasks do not count against the queue
+        self._slots = threading.BoundedSemaphore(max(1, workers) + max(0, queue_size))
+
+    def submit(self, task):
+        """
+        Queues a task, waiting while the queue is full.
+
+        Args:
+            task (dict): See run_steps.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the finished file's path.
+        """
+        self._slots.acquire()
+        try:
+            future = self.executor.submit(run_steps, task)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, cancel=False):
+        """Waits for the running tasks (and the queued ones unless ``cancel``) and stops the workers."""
+        self.executor.shutdown(wait=True, cancel_futures=cancel)
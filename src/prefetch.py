@@ -0,0 +1,145 @@
+"""
+Background lookahead that resolves playlist tracks before playback reaches them,
+so "next", jumps and auto-advance do not wait for yt-dlp.
+
+Resolutions run on a small thread pool and their results are held, together
+with the expiry of the stream URL, so going back or skipping quickly reuses
+them for as long as the URL stays valid.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from constants import STREAM_CACHE_REFRESH_MARGIN, STREAM_CACHE_DEFAULT_TTL
+from stream_cache import get_expiry
+
+# Number of upcoming tracks to resolve ahead of the current one (1-3)
+PREFETCH_DEPTH = int(os.getenv("PREFETCH_DEPTH", "2"))
+# Tracks resolved in parallel when a playlist starts or the user jumps
+PREFETCH_FANOUT = int(os.getenv("PREFETCH_FANOUT", "5"))
+# Resolutions running at the same time
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+# Resolved tracks kept for reuse; the oldest are dropped first
+MAX_HELD_RESULTS = 64
+
+
+class TrackPrefetcher:
+    """
+    Resolves stream URLs for playlist tracks on a pool of worker threads.
+
+    Results stay available until shortly before their stream URL expires, so a
+    track can be fetched from the prefetcher any number of times.
+
+    Args:
+        resolve (callable): Function mapping a track URL to a stream URL (or None).
+            Background calls pass ``quiet=True`` to keep the terminal clean.
+        depth (int): How many upcoming tracks to resolve, clamped to 1-3.
+        fanout (int): How many tracks to resolve around a start or jump target.
+        workers (int): Number of resolutions that may run at once.
+    """
+
+    def __init__(self, resolve, depth=PREFETCH_DEPTH, fanout=PREFETCH_FANOUT, workers=PREFETCH_WORKERS):
+        self.resolve = resolve
+        self.depth = max(1, min(3, depth))
+        self.fanout = max(1, fanout)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="prefetch")
+        self._futures = OrderedDict()  # Track URL -> future, oldest first
+        self._expiry = {}  # Track URL -> time after which its result must not be reused
+        self._lock = threading.Lock()
+
+    def _record_expiry(self, url, future):
+        """Notes until when a finished resolution may be reused."""
+        if future.cancelled() or future.exception() or not future.result():
+            return
+        expires = get_expiry(future.result())
+        if expires is None and "://" in future.result():
+            expires = time.time() + STREAM_CACHE_DEFAULT_TTL
+        with self._lock:
+            if self._futures.get(url) is future:
+                self._expiry[url] = (expires or float("inf")) - STREAM_CACHE_REFRESH_MARGIN
+
+    def _usable(self, url, future):
+        """Returns False for resolutions that failed, were cancelled or are about to expire."""
+        if future.cancelled():
+            return False
+        if future.done() and (future.exception() or not future.result()):
+            return False
+        return self._expiry.get(url, float("inf")) > time.time()
+
+    def submit(self, url):
+        """
+        Returns the resolution of a track, starting one unless a usable one is held.
+
+        Args:
+            url (str): The YouTube URL of the track.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the stream URL, or None on failure.
+        """
+        with self._lock:
+            future = self._futures.get(url)
+            if future is not None and self._usable(url, future):
+                self._futures.move_to_end(url)
+                return future
+            future = self._executor.submit(self.resolve, url, quiet=True)
+            self._futures[url] = future
+            self._expiry.pop(url, None)
+            while len(self._futures) > MAX_HELD_RESULTS:
+                oldest, _ = self._futures.popitem(last=False)
+                self._expiry.pop(oldest, None)
+        future.add_done_callback(lambda done: self._record_expiry(url, done))
+        return future
+
+    def prefetch_after(self, tracks, index):
+        """
+        Queues resolution of the tracks following ``index``.
+
+        Args:
+            tracks (list): Track dictionaries, each with a 'url' key.
+            index (int): Index of the track that is currently playing.
+        """
+        for track in tracks[index + 1 : index + 1 + self.depth]:
+            self.submit(track["url"])
+
+    def prefetch_around(self, tracks, index):
+        """
+        Resolves ``fanout`` tracks around ``index`` in parallel, nearest first.
+
+        Used when a playlist starts (the first tracks) and when the user jumps
+        to a track. Queued resolutions outside the new window are dropped so
+        the pool works on what is about to be played.
+
+        Args:
+            tracks (list): Track dictionaries, each with a 'url' key.
+            index (int): Index of the track that is about to play.
+        """
+        first = max(0, index - self.fanout // 2)
+        window = tracks[first : first + self.fanout]
+        wanted = {track["url"] for track in window}
+        with self._lock:
+            stale = [
+                future for url, future in self._futures.items() if url not in wanted and not future.done()
+            ]
+        for future in stale:
+            future.cancel()  # Only succeeds for resolutions that have not started
+        nearest_first = sorted(range(len(window)), key=lambda position: abs(first + position - index))
+        for position in nearest_first:
+            self.submit(window[position]["url"])
+
+    def get(self, url):
+        """
+        Returns the stream URL for a track, waiting for an in-flight or held
+        resolution instead of starting a second extraction.
+
+        Args:
+            url (str): The YouTube URL of the track.
+
+        Returns:
+            str: The stream URL, or None if resolution failed.
+        """
+        return self.submit(url).result()
+
+    def close(self):
+        """Stops the workers, dropping any lookahead that has not started yet."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,183 @@
+"""
+Retry policy for stream URL resolution.
+
+Extraction failures are sorted into permanent ones (the video is private,
+removed or blocked in this region) and transient ones (network trouble, rate
+limiting, YouTube hiccups):
+
+- Permanent failures are remembered per video ID for NEGATIVE_CACHE_TTL
+  seconds, so a dead video in a playlist costs one extraction, not one per pass.
+- Transient failures are retried with exponential backoff and full jitter.
+- When transient failures keep piling up across all videos, a circuit breaker
+  opens and further calls fail immediately for CIRCUIT_COOLDOWN seconds. After
+  that a single trial call decides whether to close it again.
+"""
+import os
+import random
+import re
+import threading
+import time
+from yt_dlp.utils import DownloadError, GeoRestrictedError, UnsupportedError
+
+# Seconds a video that failed permanently is not tried again
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", "600"))
+# Attempts per resolution for transient failures
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = 0.5  # seconds, doubled after every failed attempt
+RETRY_MAX_DELAY = 8.0  # seconds
+# Consecutive transient failures (any video) that open the circuit breaker
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+# Seconds the circuit stays open before a trial call is let through
+CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "30"))
+
+# yt-dlp messages that mean retrying will not help
+PERMANENT_ERROR_PATTERN = re.compile(
+    r"video unavailable|private video|has been removed|been terminated|"
+    r"not available in your country|blocked it in your country|copyright|"
+    r"members-only|join this channel|confirm your age|inappropriate|"
+    r"is not a valid url|unsupported url|incomplete youtube id",
+    re.IGNORECASE,
+)
+
+_lock = threading.Lock()
+_dead = {}  # video ID -> (retry-after timestamp, reason)
+_failures = 0  # Consecutive transient failures across all videos
+_opened_at = None  # When the circuit breaker opened, or None while closed
+_trial_running = False  # A half-open trial call is in progress
+
+
+class ResolutionError(Exception):
+    """
+    Raised when a stream URL could not be resolved.
+
+    Attributes:
+        kind (str): "permanent" (the video cannot be played), "transient"
+            (retries were exhausted) or "circuit_open" (resolution is paused).
+    """
+
+    def __init__(self, message, kind):
+        super().__init__(message)
+        self.kind = kind
+
+
+def classify(error):
+    """
+    Decides whether an extraction error is worth retrying.
+
+    Args:
+        error (Exception): The error raised while extracting.
+
+    Returns:
+        str: "permanent" or "transient".
+    """
+    cause = error
+    if isinstance(error, DownloadError) and error.exc_info and error.exc_info[1]:
+        cause = error.exc_info[1]
+    if isinstance(cause, (GeoRestrictedError, UnsupportedError, KeyError)):
+        return "permanent"
+    if PERMANENT_ERROR_PATTERN.search(str(error)):
+        return "permanent"
+    return "transient"
+
+
+def backoff_delay(attempt):
+    """Returns a full-jitter delay before retry number ``attempt`` (1-based)."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+def _check_negative_cache(video_id):
+    entry = _dead.get(video_id)
+    if entry is None:
+        return None
+    retry_after, reason = entry
+    if retry_after <= time.time():
+        del _dead[video_id]
+        return None
+    return reason
+
+
+def _enter():
+    """Raises if the circuit is open; returns True if this call is the half-open trial."""
+    global _trial_running
+    if _opened_at is None:
+        return False
+    remaining = _opened_at + CIRCUIT_COOLDOWN - time.time()
+    if remaining > 0 or _trial_running:
+        raise ResolutionError(
+            f"YouTube extraction keeps failing; paused for {max(1, int(remaining))} more seconds",
+            "circuit_open",
+        )
+    _trial_running = True
+    return True
+
+
+def _end_trial():
+    """Lets the next call past an open circuit run a trial again."""
+    global _trial_running
+    with _lock:
+        _trial_running = False
+
+
+def _record_success():
+    global _failures, _opened_at, _trial_running
+    _failures = 0
+    _opened_at = None
+    _trial_running = False
+
+
+def _record_transient_failure(trial):
+    global _failures, _opened_at, _trial_running
+    _failures += 1
+    if trial or _failures >= CIRCUIT_FAILURE_THRESHOLD:
+        _opened_at = time.time()
+    _trial_running = False
+
+
+def resolve(video_id, extract):
+    """
+    Runs ``extract`` under the retry policy.
+
+    Args:
+        video_id (str): YouTube video ID, used for negative caching (may be None).
+        extract (callable): Performs one extraction and returns its result.
+
+    Returns:
+        The result of ``extract``.
+
+    Raises:
+        ResolutionError: If the video is known dead, failed permanently, kept
+            failing after RETRY_ATTEMPTS attempts, or the circuit is open.
+    """
+    for attempt in range(1, RETRY_ATTEMPTS + 1):
+        with _lock:
+            reason = _check_negative_cache(video_id) if video_id else None
+            if reason:
+                raise ResolutionError(reason, "permanent")
+            trial = _enter()
+        try:
+            result = extract()
+        except Exception as e:
+            kind = classify(e)
+            with _lock:
+                if kind == "permanent":
+                    if trial:
+                        _record_success()  # YouTube answered; the video itself is the problem
+                    if video_id:
+                        _dead[video_id] = (time.time() + NEGATIVE_CACHE_TTL, str(e))
+                    raise ResolutionError(str(e), "permanent") from e
+                _record_transient_failure(trial)
+                circuit_open = _opened_at is not None
+            if attempt == RETRY_ATTEMPTS or circuit_open:
+                raise ResolutionError(str(e), "transient") from e
+            time.sleep(backoff_delay(attempt))
+            continue
+        else:
+            with _lock:
+                _record_success()
+            return result
+        finally:
+            if trial:
+                # Also when the trial was interrupted (KeyboardInterrupt, a
+                # cancelled player), so the next call after the cooldown can try again
+                _end_trial()
+
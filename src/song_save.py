@@ -1,5 +1,6 @@
 import json
 import audio_player as ap
+import offline_sync
 from termcolor import colored
 from constants import SONGS_FILE, PLAYLISTS_FILE, SUCCESS_SONG_SAVED, SUCCESS_SONG_UPDATED, SUCCESS_SONG_REMOVED
 
@@ -146,7 +147,7 @@ def song_player_menu(songs):
             song_choice = int(song_choice)
             if 1 <= song_choice <= len(songs):
                 url = songs[song_choice - 1]["url"]
-                ap.play_song(url)
+                ap.play_song(url, cache_audio=True)
             else:
                 print(colored("Invalid song number", "red"))
         except ValueError:
@@ -268,141 +269,8 @@ def play_saved_playlist_enhanced(playlist_name, songs):
     print(colored(f"\n=== PLAYING PLAYLIST: {playlist_name} ===", "green"))
     print(colored(f"Total songs: {len(songs)}", "yellow"))
     
-    current_index = 0
-    volume = 50
-    auto_next = True  # Automatically play next song when current ends
-    
-    while current_index < len(songs):
-        current_song = songs[current_index]
-        
-        print(colored(f"\n--- Playing {current_index + 1}/{len(songs)}: {current_song['name']} ---", "green"))
-        
-        try:
-            # Import VLC here to avoid issues if not available
-            try:
-                import vlc
-                import time
-            except ImportError:
-                print(colored("VLC media player is not available. Cannot play audio.", "red"))
-                print(colored("Please install VLC media player and ensure python-vlc package is properly configured.", "yellow"))
-                time.sleep(3)
-                return
-            
-            # Get audio URL using the existing function
-            audio_url = ap.get_audio_url(current_song['url'])
-            if not audio_url:
-                print(colored(f"Skipping {current_song['name']} - could not fetch audio", "red"))
-                current_index += 1
-                continue
-            
-            player = vlc.MediaPlayer(audio_url)
-            player.audio_set_volume(volume)
-            player.play()
-            
-            print(colored(f"Volume: {volume}%", "cyan"))
-            time.sleep(2)  # Give time for the song to start loading
-            
-            # Track if we need to continue to next song
-            playlist_ended = False
-            
-            # Main playlist control loop
-            while not playlist_ended:
-                # Check if song has ended (if auto_next is enabled)
-                if auto_next and player.get_length() > 0:
-                    current_time = player.get_time() / 1000.0  # Convert to seconds
-                    duration = player.get_length() / 1000.0  # Convert to seconds
-                    
-                    # If we're within 5 seconds of the end, prepare next song
-                    if current_time >= (duration - 5) and current_time < duration:
-                        print(colored("Song almost finished, preparing next song...", "yellow"))
-                        time.sleep(3)
-                        current_index += 1
-                        playlist_ended = True
-                        break
-                
-                # Display playlist-specific controls
-                auto_status = "ON" if auto_next else "OFF"
-                auto_color = "green" if auto_next else "red"
-                print(
-                    colored("\nPlaylist Controls: ", "yellow")
-                    + colored("[N] Next Song | ", "green")
-                    + colored("[P] Previous Song | ", "blue")
-                    + colored("[C] Pause/Resume | ", "cyan")
-                    + colored("[R] Restart Song | ", "magenta")
-                    + colored(f"[A] Auto Next: {auto_status} | ", auto_color)
-                    + colored("[V] Volume +/- | ", "cyan")
-                    + colored("[Q] Exit Playlist", "red")
-                )
-                
-                command = input(colored("Enter command: ", "yellow")).strip().lower()
-                
-                if command == "n":  # Next song
-                    current_index += 1
-                    playlist_ended = True
-                    player.stop()
-                    print(colored("Moving to next song.", "green"))
-                    break
-                    
-                elif command == "p":  # Previous song
-                    if current_index > 0:
-                        current_index -= 1
-                        playlist_ended = True
-                        player.stop()
-                        print(colored("Moving to previous song.", "blue"))
-                        break
-                    else:
-                        print(colored("Already at the first song.", "yellow"))
-                        
-                elif command == "c":  # Pause/Resume
-                    if player.is_playing():
-                        player.pause()
-                        print(colored("Music paused.", "yellow"))
-                    else:
-                        player.play()
-                        print(colored("Music resumed.", "green"))
-                        
-                elif command == "r":  # Restart current song
-                    player.stop()
-                    player.play()
-                    print(colored("Song restarted.", "magenta"))
-                    
-                elif command == "a":  # Toggle auto next
-                    auto_next = not auto_next
-                    if auto_next:
-                        print(colored("Auto next enabled. Will play next song automatically.", "green"))
-                    else:
-                        print(colored("Auto next disabled. You'll need to press N for next song.", "red"))
-                    
-                elif command == "v":  # Volume control
-                    print(colored(f"Current volume: {volume}%", "cyan"))
-                    vol_cmd = input(colored("Enter new volume (0-100) or press Enter to cancel: ", "yellow")).strip()
-                    if vol_cmd.isdigit():
-                        new_vol = int(vol_cmd)
-                        if 0 <= new_vol <= 100:
-                            volume = new_vol
-                            player.audio_set_volume(volume)
-                            print(colored(f"Volume set to {volume}%.", "cyan"))
-                        else:
-                            print(colored("Invalid volume level. Please enter a number between 0 and 100.", "red"))
-                    
-                elif command == "q":  # Exit playlist
-                    player.stop()
-                    print(colored("Exiting playlist.", "red"))
-                    return
-                    
-                else:
-                    print("Invalid command. Try again.")
-                
-                # Small delay to prevent excessive CPU usage
-                time.sleep(0.5)
-                
-        except Exception as e:
-            print(colored(f"Error playing {current_song['name']}: {e}", "red"))
-            current_index += 1
-            continue
-    
-    # Playlist finished
-    if current_index >= len(songs):
+    tracks = [{"title": song["name"], "url": song["url"]} for song in songs]
+    if ap.play_tracks(tracks, cache_audio=True):
         print(colored("\n=== Playlist completed! ===", "green"))
         play_again = input(colored("Do you want to play the playlist again? (y/n): ", "yellow")).strip().lower()
         if play_again == "y":
@@ -465,6 +333,65 @@ def play_all_saved_songs_playlist():
         play_saved_playlist_enhanced("All Saved Songs", all_songs)
 
 
+def choose_offline_playlist():
+    """
+    Lets the user pick a saved playlist or "All Saved Songs".
+
+    Returns:
+        tuple: (playlist name, list of songs), or None if nothing was chosen.
+    """
+    choices = list(get_playlists().items())
+    all_songs = get_songs()
+    if all_songs:
+        choices.append(("All Saved Songs", all_songs))
+    if not choices:
+        print(colored("No songs saved yet.", "yellow"))
+        return None
+
+    for i, (name, songs) in enumerate(choices, start=1):
+        print(colored(f"{i}. {name} ({len(songs)} songs)", "cyan"))
+    try:
+        choice = int(input(colored("Enter playlist number: ", "green")))
+        if 1 <= choice <= len(choices):
+            return choices[choice - 1]
+        print(colored("Invalid playlist number.", "red"))
+    except ValueError:
+        print(colored("Invalid input. Please enter a number.", "red"))
+    return None
+
+
+def download_playlist_offline():
+    """
+    Downloads every song of a saved playlist (or all saved songs) to the local
+    audio cache so it plays without a network connection.
+    """
+    selected = choose_offline_playlist()
+    if not selected:
+        return
+    name, songs = selected
+
+    workers = input(
+        colored(f"Parallel downloads (default {offline_sync.OFFLINE_WORKERS}): ", "green")
+    ).strip()
+    workers = int(workers) if workers.isdigit() and int(workers) > 0 else offline_sync.OFFLINE_WORKERS
+
+    print(colored(f"\nDownloading '{name}' for offline listening...", "green"))
+    ready, failed = offline_sync.warm_up(songs, workers)
+    print(colored(f"{ready}/{len(songs)} songs are available offline.", "blue"))
+    for song in failed:
+        print(colored(f"Could not download: {song['name']}", "red"))
+
+
+def release_playlist_offline():
+    """
+    Releases the offline copies of a playlist so the audio cache may evict them.
+    """
+    selected = choose_offline_playlist()
+    if selected:
+        offline_sync.release(selected[1])
+        print(colored(f"Offline copies of '{selected[0]}' released.", "blue"))
+
+
 def music_library():
     """
     Displays the main music library menu and handles user interactions
@@ -481,7 +408,9 @@ def music_library():
         "8": ("View Playlists", view_playlists),
         "9": ("Play Playlist", play_playlist),
         "10": ("Play All Saved Songs (Auto-Progression)", play_all_saved_songs_playlist),
-        "11": ("Exit", lambda: "exit")
+        "11": ("Download Playlist for Offline Listening", download_playlist_offline),
+        "12": ("Release Offline Downloads", release_playlist_offline),
+        "13": ("Exit", lambda: "exit")
     }
 
     while True:
@@ -493,7 +422,7 @@ def music_library():
 
         if choice in menu_options:
             action = menu_options[choice][1]
-            if choice == "11":  # Exit option
+            if choice == "13":  # Exit option
                 break
             elif callable(action):
                 action()
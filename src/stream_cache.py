@@ -0,0 +1,162 @@
+"""
+Persistent cache of resolved audio stream URLs, keyed by YouTube video ID and
+format profile (streams resolved under a bitrate cap are kept apart).
+
+Entries survive restarts, are dropped shortly before the stream URL expires
+and are evicted least-recently-used once the cache is full. Cache hits only
+update recency in memory; it reaches the disk with the next write, or at most
+RECENCY_SAVE_INTERVAL seconds later.
+"""
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+from constants import (
+    CACHE_MAX_SIZE,
+    STREAM_CACHE_FILE,
+    STREAM_CACHE_REFRESH_MARGIN,
+    STREAM_CACHE_DEFAULT_TTL,
+)
+
+# Longest a cache hit's recency update waits in memory for another write
+RECENCY_SAVE_INTERVAL = 60
+
+_lock = threading.Lock()
+_entries = None  # Loaded lazily from STREAM_CACHE_FILE
+_saved_at = 0.0  # When the entry table was last written
+
+
+def get_expiry(stream_url):
+    """
+    Reads the expiry timestamp embedded in a googlevideo stream URL.
+
+    YouTube puts it either in the query string (``expire=1700000000``) or,
+    for some manifest URLs, as a path segment (``/expire/1700000000/``).
+
+    Args:
+        stream_url (str): The resolved stream URL.
+
+    Returns:
+        float: Expiry as a Unix timestamp, or None if the URL carries none.
+    """
+    try:
+        parsed = urlparse(stream_url)
+        values = parse_qs(parsed.query).get("expire")
+        if values:
+            return float(values[0])
+        parts = parsed.path.split("/")
+        if "expire" in parts:
+            return float(parts[parts.index("expire") + 1])
+    except (ValueError, IndexError):
+        pass
+    return None
+
+
+def _load():
+    """Returns the in-memory entry table, reading it from disk on first use."""
+    global _entries
+    if _entries is None:
+        try:
+            with open(STREAM_CACHE_FILE, "r") as file:
+                _entries = json.load(file)
+        except (FileNotFoundError, ValueError):
+            _entries = {}
+    return _entries
+
+
+def _save():
+    """Writes the entry table to disk atomically."""
+    global _saved_at
+    _saved_at = time.time()
+    try:
+        os.makedirs(os.path.dirname(STREAM_CACHE_FILE), exist_ok=True)
+        temp_file = STREAM_CACHE_FILE + ".tmp"
+        with open(temp_file, "w") as file:
+            json.dump(_entries, file)
+        os.replace(temp_file, STREAM_CACHE_FILE)
+    except OSError:
+        # A read-only or full disk only costs us persistence
+        pass
+
+
+def _key(video_id, profile):
+    return video_id if profile is None else f"{video_id}@{profile}"
+
+
+def get_cached_url(video_id, profile=None):
+    """
+    Looks up a still-valid stream URL for a video.
+
+    Entries within STREAM_CACHE_REFRESH_MARGIN of their expiry are treated as
+    misses and removed, so the caller re-resolves them before they go dead.
+
+    Args:
+        video_id (str): The YouTube video ID.
+        profile (str): Format profile the URL was resolved for (None for best audio).
+
+    Returns:
+        str: The cached stream URL, or None on a miss.
+    """
+    key = _key(video_id, profile)
+    with _lock:
+        entries = _load()
+        entry = entries.get(key)
+        if not entry:
+            return None
+        now = time.time()
+        if entry["expires_at"] - STREAM_CACHE_REFRESH_MARGIN <= now:
+            del entries[key]
+            _save()
+            return None
+        entry["last_used"] = now
+        if now - _saved_at >= RECENCY_SAVE_INTERVAL:
+            _save()
+        return entry["url"]
+
+
+def store_url(video_id, stream_url, profile=None):
+    """
+    Stores a successfully resolved stream URL.
+
+    Only real URLs should be passed in; failures are never cached.
+
+    Args:
+        video_id (str): The YouTube video ID.
+        stream_url (str): The resolved stream URL.
+        profile (str): Format profile the URL was resolved for (None for best audio).
+    """
+    if not video_id or not stream_url:
+        return
+    now = time.time()
+    expires_at = get_expiry(stream_url) or now + STREAM_CACHE_DEFAULT_TTL
+    with _lock:
+        entries = _load()
+        entries[_key(video_id, profile)] = {
+            "url": stream_url,
+            "expires_at": expires_at,
+            "last_used": now,
+        }
+        # Evict least recently used entries beyond the size limit
+        if len(entries) > CACHE_MAX_SIZE:
+            by_age = sorted(entries, key=lambda key: entries[key]["last_used"])
+            for key in by_age[: len(entries) - CACHE_MAX_SIZE]:
+                del entries[key]
+        _save()
+
+
+def invalidate(video_id):
+    """
+    Removes a video's entries for every profile, e.g. after the player reports
+    the URL as dead.
+
+    Args:
+        video_id (str): The YouTube video ID.
+    """
+    with _lock:
+        entries = _load()
+        keys = [key for key in entries if key == video_id or key.startswith(f"{video_id}@")]
+        for key in keys:
+            del entries[key]
+        if keys:
+            _save()
@@ -0,0 +1,159 @@
+"""
+Bandwidth-adaptive audio quality for streaming.
+
+A throughput meter keeps a moving average of how fast audio actually arrives,
+fed by yt-dlp download progress (passed on by bandwidth.progress_hook, which
+leaves out downloads the bandwidth limit slowed down) and by the bytes libvlc
+reads while buffering a stream. Before a song is streamed the
+bitrate cap is the lower of the user's cap ("max 128 kbps") and what the
+measured bandwidth can sustain with some headroom. yt-dlp then picks the best
+audio format under the cap, preferring Opus, or failing that the smallest one.
+"""
+import json
+import os
+import threading
+from termcolor import colored
+from constants import STREAM_QUALITY_FILE
+
+# Bitrate caps (kbps) that adaptive selection chooses from, lowest first
+BITRATE_TIERS = (48, 64, 96, 128, 160)
+# Bandwidth needed per kbps of audio so playback starts quickly and does not stall
+HEADROOM = 2.0
+# Weight of a new throughput sample in the moving average
+SMOOTHING = 0.3
+# Samples smaller than this mostly measure connection setup, not bandwidth
+MIN_SAMPLE_BYTES = 64 * 1024
+
+# Defaults until the user picks a quality in the menu
+DEFAULT_MAX_KBPS = int(os.getenv("STREAM_MAX_KBPS", "0")) or None
+DEFAULT_ADAPTIVE = os.getenv("ADAPTIVE_QUALITY", "1") == "1"
+
+_lock = threading.Lock()
+_throughput = None  # Smoothed bytes per second, or None before the first sample
+_settings = None  # Loaded lazily from STREAM_QUALITY_FILE
+
+
+def record_throughput(byte_count, seconds):
+    """
+    Adds a throughput sample to the moving average.
+
+    Args:
+        byte_count (int): Bytes received.
+        seconds (float): Time it took to receive them.
+    """
+    global _throughput
+    if byte_count < MIN_SAMPLE_BYTES or seconds <= 0:
+        return
+    sample = byte_count / seconds
+    with _lock:
+        if _throughput is None:
+            _throughput = sample
+        else:
+            _throughput = SMOOTHING * sample + (1 - SMOOTHING) * _throughput
+
+
+def progress_hook(status):
+    """yt-dlp progress hook that measures finished downloads."""
+    if status.get("status") == "finished":
+        record_throughput(status.get("downloaded_bytes") or status.get("total_bytes") or 0, status.get("elapsed") or 0)
+
+
+def estimated_kbps():
+    """Returns the measured bandwidth in kbit/s, or None if nothing was measured yet."""
+    with _lock:
+        return None if _throughput is None else _throughput * 8 / 1000
+
+
+def _load_settings():
+    global _settings
+    if _settings is None:
+        _settings = {"max_kbps": DEFAULT_MAX_KBPS, "adaptive": DEFAULT_ADAPTIVE}
+        try:
+            with open(STREAM_QUALITY_FILE, "r") as file:
+                _settings.update(json.load(file))
+        except (FileNotFoundError, ValueError):
+            pass
+    return _settings
+
+
+def save_settings(max_kbps, adaptive):
+    """
+    Stores the user's streaming quality choice.
+
+    Args:
+        max_kbps (int): Bitrate cap in kbit/s, or None for no cap.
+        adaptive (bool): Lower the bitrate further when bandwidth is tight.
+    """
+    settings = _load_settings()
+    settings.update(max_kbps=max_kbps, adaptive=adaptive)
+    try:
+        with open(STREAM_QUALITY_FILE, "w") as file:
+            json.dump(settings, file, indent=4)
+    except OSError as e:
+        print(colored(f"Could not save the streaming quality: {e}", "red"))
+
+
+def current_cap():
+    """
+    Returns the bitrate cap for the next stream.
+
+    Returns:
+        int: Cap in kbit/s, or None to stream the best available audio.
+    """
+    settings = _load_settings()
+    cap = settings["max_kbps"]
+    bandwidth = estimated_kbps() if settings["adaptive"] else None
+    if bandwidth is not None:
+        affordable = [tier for tier in BITRATE_TIERS if tier * HEADROOM <= bandwidth]
+        bandwidth_cap = affordable[-1] if affordable else BITRATE_TIERS[0]
+        # The top tier means bandwidth is plentiful; leave the format uncapped then
+        if bandwidth_cap != BITRATE_TIERS[-1]:
+            cap = bandwidth_cap if cap is None else min(cap, bandwidth_cap)
+    return cap
+
+
+def format_selector(cap):
+    """
+    Builds the yt-dlp format string for a bitrate cap.
+
+    Args:
+        cap (int): Cap in kbit/s, or None for no cap.
+
+    Returns:
+        str: The format selector.
+    """
+    if cap is None:
+        return "bestaudio/best"
+    return f"bestaudio[abr<={cap}][acodec=opus]/bestaudio[abr<={cap}]/worstaudio/best"
+
+
+def profile_name(cap):
+    """Returns the stream cache profile for a cap (None for uncapped streams)."""
+    return None if cap is None else f"{cap}k"
+
+
+def quality_menu():
+    """
+    Lets the user pick the streaming quality.
+    """
+    settings = _load_settings()
+    cap = settings["max_kbps"]
+    bandwidth = estimated_kbps()
+    print(colored("\n--- Streaming Quality ---", "yellow"))
+    print(colored(f"Current: {'best available' if cap is None else f'max {cap} kbps'}"
+                  f", adaptive {'ON' if settings['adaptive'] else 'OFF'}", "cyan"))
+    if bandwidth is not None:
+        print(colored(f"Measured bandwidth: {bandwidth:.0f} kbps", "cyan"))
+    print(colored("1. Best available (adaptive)", "green"))
+    print(colored("2. Max 160 kbps (adaptive)", "green"))
+    print(colored("3. Max 128 kbps (adaptive)", "green"))
+    print(colored("4. Max 64 kbps (data saver)", "green"))
+    print(colored("5. Always best available (never adapt)", "green"))
+    print(colored("6. Back", "green"))
+    choices = {"1": (None, True), "2": (160, True), "3": (128, True), "4": (64, True), "5": (None, False)}
+    choice = input(colored("Enter your choice: ", "yellow")).strip()
+    if choice in choices:
+        save_settings(*choices[choice])
+        print(colored("Streaming quality saved.", "green"))
+    elif choice != "6":
+        print(colored("Invalid choice", "red"))
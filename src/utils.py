@@ -2,7 +2,9 @@
 Utility functions used across the application.
 """
 import os
+import re
 from termcolor import colored
+from constants import YOUTUBE_VIDEO_ID_PATTERN, YOUTUBE_PLAYLIST_ID_PATTERN
 
 
 def clear_screen():
@@ -53,3 +55,57 @@ def validate_input_not_empty(value, error_message="Input cannot be empty."):
         print_colored(error_message, "red")
         return False
     return True
+
+
+def extract_video_id(url):
+    """
+    Extracts the 11-character video ID from a YouTube URL.
+
+    Args:
+        url (str): A youtube.com or youtu.be video URL
+
+    Returns:
+        str: The video ID, or None if the URL does not contain one
+    """
+    match = re.search(YOUTUBE_VIDEO_ID_PATTERN, url or "")
+    return match.group(1) if match else None
+
+
+def extract_playlist_id(url):
+    """
+    Extracts the playlist ID from a YouTube playlist URL.
+
+    Args:
+        url (str): A URL with a ``list=`` query parameter
+
+    Returns:
+        str: The playlist ID, or None if the URL does not contain one
+    """
+    match = re.search(YOUTUBE_PLAYLIST_ID_PATTERN, url or "")
+    return match.group(1) if match else None
+
+
+def format_duration(seconds):
+    """
+    Formats a number of seconds as m:ss, or h:mm:ss for an hour or more.
+
+    Args:
+        seconds (float): Duration in seconds.
+
+    Returns:
+        str: The formatted duration.
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class SilentLogger:
+    """yt-dlp logger that drops every message, for callers that report errors themselves."""
+
+    def debug(self, message):
+        pass
+
+    info = warning = error = debug
@@ -1,8 +1,13 @@
 # from pytube import YouTube      # for downloading YouTube videos
-import yt_dlp
+import ydl_pool  # shared yt-dlp sessions
+import download_queue  # parallel downloads
+import download_journal  # resumable download batches
+import format_table  # format table and smallest-format selection
+import info_cache  # cached video information
 import os  # for managing file paths
 import re  # for regular expression matching
 from termcolor import colored
+from utils import extract_playlist_id, extract_video_id
 
 
 def download_directory():
@@ -19,6 +24,10 @@ def download_directory():
 def get_url(url):
     """
     Fetches YouTube video information using yt-dlp.
+    Information fetched recently (here or anywhere else in the app) is taken
+    from the info cache instead. It is only good for showing the video and
+    its formats: it may come from another extraction profile or have expired
+    stream URLs.
 
     Args:
         url (str): The YouTube video URL.
@@ -27,18 +36,23 @@ def get_url(url):
         dict: Video information dictionary, or None if fetching fails.
     """
     try:
-        ydl_opts = {"quiet": True, "no_warnings": True}
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            yt = ydl.extract_info(url, download=False)
-            print(colored(f"\nTitle: {yt['title']}", "cyan"))
-            print(colored(f"Uploader: {yt['uploader']}", "yellow"))
-            duration = yt.get("duration", 0)
-            print(
-                colored(
-                    f"Length: {duration // 60} minutes and {duration % 60} seconds",
-                    "green",
-                )
+        profile = download_queue.extraction_profile()
+        yt = info_cache.get(extract_video_id(url), profile, need_streams=False)
+        if yt is None:
+            # Same extraction settings as the download, so the information can be reused for it
+            ydl_opts = {"quiet": True, "no_warnings": True, **download_queue.extractor_options()}
+            with ydl_pool.borrow(ydl_opts) as ydl:
+                yt = ydl.extract_info(url, download=False)
+            info_cache.store(yt, profile)
+        print(colored(f"\nTitle: {yt['title']}", "cyan"))
+        print(colored(f"Uploader: {yt['uploader']}", "yellow"))
+        duration = yt.get("duration", 0)
+        print(
+            colored(
+                f"Length: {duration // 60} minutes and {duration % 60} seconds",
+                "green",
             )
+        )
         return yt
     except Exception as e:
         print(colored(f"Error fetching video information: {e}", "red"))
@@ -46,72 +60,73 @@ def get_url(url):
         return None
 
 
-def display_streams(url):
+def display_streams(info, sort_key="resolution"):
     """
-    Displays available video/audio formats for the given YouTube URL.
+    Displays a table of the available formats of an already extracted video.
 
     Args:
-        url (str): The YouTube video URL.
+        info (dict): Video information dictionary returned by get_url.
+        sort_key (str): Column to sort by (see format_table.SORT_KEYS).
 
     Returns:
-        dict: Dictionary of format IDs to descriptions, or None if fetching fails.
+        dict: Dictionary of format IDs to table rows, or None if none are available.
     """
     try:
-        print(colored("\nFetching available formats...\n", "cyan"))
-        options = {
-            "listformats": False,  # Disable format listing
-            "quiet": True,
-            "no_warnings": True,  # Suppress unnecessary output
-        }
-
-        formats = {}
-
-        # Use yt-dlp to extract formats
-        with yt_dlp.YoutubeDL(options) as ydl:
-            yt = ydl.extract_info(url, download=False)
-            for fmt in yt["formats"]:
-                if fmt.get("ext") and fmt.get("format_note"):
-                    formats[fmt["format_id"]] = f"{fmt['format_note']} ({fmt['ext']})"
-
-        # Display formats
-        print(colored("Available formats:", "yellow"))
-        for fmt_id, description in formats.items():
-            print(colored(f"{fmt_id}: ", "green") + colored(description, "cyan"))
-
-        return formats
-    except KeyboardInterrupt:
-        print(colored("\nFormat selection canceled by the user.", "red"))
-        return None
+        rows = format_table.sort_rows(format_table.format_rows(info), sort_key)
+        if not rows:
+            return None
+
+        print(colored(f"\nAvailable formats (sorted by {sort_key}, ~ = estimated size):", "yellow"))
+        format_table.print_table(rows)
+        return {row["id"]: row for row in rows}
     except Exception as e:
-        print(colored(f"Error fetching available formats: {e}", "red"))
+        print(colored(f"Error reading available formats: {e}", "red"))
         print(colored("Please check the video URL or try again later.", "yellow"))
         return None
 
 
-def download_stream(url, format_id, path):
+def choose_format_policy():
     """
-    Downloads the selected video/audio stream to the specified path.
+    Asks which format policy to apply to every video of a playlist.
 
-    Args:
-        url (str): The YouTube video URL.
-        format_id (str): The format ID to download.
-        path (str): The directory path to save the file.
+    Returns:
+        str: The yt-dlp format selector, or None if the user skips the playlist.
     """
-    print(colored("\nDownloading...", "yellow"))
-    try:
-        ydl_opts = {
-            "outtmpl": os.path.join(path, "%(title)s.%(ext)s"),
-            "format": format_id,
-            "no_warnings": True,  # Suppress warnings during download
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-        print(colored("Download complete!", "green"))
-    except KeyboardInterrupt:
-        print(colored("\nDownload canceled by the user.", "red"))
-    except Exception as e:
-        print(colored(f"Download failed: {e}", "red"))
-        print(colored("Please check the selected format ID or your network connection.", "yellow"))
+    names = list(download_queue.FORMAT_POLICIES)
+    print(colored("\nFormat for every video in this playlist:", "yellow"))
+    for number, name in enumerate(names, 1):
+        print(colored(f"{number}: ", "green") + colored(download_queue.FORMAT_POLICIES[name][0], "cyan"))
+    while True:
+        choice = input(colored("\nEnter a number (or type 'cancel' to skip): ", "yellow")).strip()
+        if choice.lower() == "cancel":
+            return None
+        if choice.isdigit() and 1 <= int(choice) <= len(names):
+            return download_queue.FORMAT_POLICIES[names[int(choice) - 1]][1]
+        print(colored("Invalid choice. Please try again or type 'cancel' to skip.", "red"))
+
+
+def resume_unfinished_downloads():
+    """
+    Offers to resume the downloads that were still pending when the app last
+    stopped; declined jobs are removed from the journal.
+    """
+    entries = download_journal.unfinished()
+    if not entries:
+        return
+    print(colored(f"\n{len(entries)} download(s) from an earlier session did not finish:", "yellow"))
+    for entry in entries[:10]:
+        print(colored(f"  - {entry['title']}", "cyan"))
+    if len(entries) > 10:
+        print(colored(f"  ... and {len(entries) - 10} more", "cyan"))
+    choice = input(colored("Resume them now? (yes/no): ", "yellow")).strip().lower()
+    if choice != "yes":
+        download_journal.forget(entries)
+        print(colored("Unfinished downloads discarded.", "yellow"))
+        return
+    jobs = [download_queue.restore_job(entry) for entry in entries]
+    download_queue.run_jobs(jobs)
+    done = sum(job["state"] == "done" for job in jobs)
+    print(colored(f"{done}/{len(jobs)} resumed downloads complete!", "green" if done == len(jobs) else "yellow"))
 
 
 def is_youtube_url(url):
@@ -133,10 +148,12 @@ def is_youtube_url(url):
 def input_url_for_video():
     """
     Handles user input for YouTube video URLs and format selection for downloading.
-    Supports multiple URLs separated by commas.
+    Supports multiple URLs separated by commas and playlist URLs; the formats
+    are chosen first and the downloads then run in parallel.
     """
     download_path = download_directory()
     print(colored(f"Files will be saved in: {download_path}", "cyan"))
+    resume_unfinished_downloads()
     while True:
         urls = (
             input(colored("Enter YouTube video URL(s) separated by commas: ", "yellow"))
@@ -149,6 +166,8 @@ def input_url_for_video():
             print(colored("No valid URLs provided. Please try again.", "red"))
             continue
 
+        # Collect a format for every video first, then download them in parallel
+        jobs = []
         for url in urls:
             # Validate URL format before processing
             if not is_youtube_url(url):
@@ -158,13 +177,30 @@ def input_url_for_video():
 
             print(colored(f"\nProcessing URL: {url}", "cyan"))
 
+            # Playlists become one job per video, all with the same format policy
+            if extract_playlist_id(url) and not extract_video_id(url):
+                format_selector = choose_format_policy()
+                if format_selector:
+                    try:
+                        playlist_jobs = download_queue.expand_playlist(url, format_selector, download_path)
+                    except ValueError as e:
+                        print(colored(str(e), "red"))
+                        continue
+                    print(colored(f"Queued {len(playlist_jobs)} videos from the playlist.", "green"))
+                    jobs.extend(playlist_jobs)
+                continue
+
             # Fetch video information
             yt = get_url(url)
             if not yt:
                 print(colored("Skipping invalid or inaccessible URL. It might be private, deleted, or region-restricted.", "red"))
                 continue
 
-            streams = display_streams(url)
+            # Reuse the extracted information for the format list, and for the
+            # download only if it was extracted for downloading and its stream
+            # URLs have not expired; otherwise the download extracts it again
+            reusable = info_cache.get(yt["id"], download_queue.extraction_profile())
+            streams = display_streams(yt)
             if not streams:
                 print(
                     colored(
@@ -173,17 +209,42 @@ def input_url_for_video():
                 )
                 continue
 
+            print(colored(
+                "Enter a format ID (join a video and an audio ID with '+'), 'sort <column>' to reorder "
+                f"({', '.join(format_table.SORT_KEYS)}), or 'smallest <constraint>' to pick the smallest "
+                "match, e.g. 'smallest height>=720' or 'smallest audio abr>=128'.",
+                "cyan",
+            ))
             while True:
                 format_id = input(
                     colored(
-                        "\nEnter the number of your preferred format (or type 'cancel' to skip): ",
+                        "\nEnter your preferred format (or type 'cancel' to skip): ",
                         "yellow",
                     )
                 ).strip()
+                command, _, argument = format_id.partition(" ")
                 if format_id.lower() == "cancel":
                     print(colored("Skipping this video.", "yellow"))
                     break
-                elif format_id not in streams:
+                elif command.lower() == "sort":
+                    if argument.strip().lower() in format_table.SORT_KEYS:
+                        display_streams(yt, argument.strip().lower())
+                    else:
+                        print(colored(f"Sort by one of: {', '.join(format_table.SORT_KEYS)}", "red"))
+                elif command.lower() == "smallest":
+                    try:
+                        row = format_table.select_smallest(yt, argument)
+                    except ValueError as e:
+                        print(colored(str(e), "red"))
+                        continue
+                    if row is None:
+                        print(colored("No format meets that constraint.", "red"))
+                        continue
+                    size = format_table.format_size(row["size"], row["size_estimated"])
+                    print(colored(f"Selected {row['id']} ({size}).", "green"))
+                    jobs.append(download_queue.make_job(url, row["id"], download_path, info=reusable))
+                    break
+                elif not all(part in streams for part in format_id.split("+")):
                     print(
                         colored(
                             "Invalid choice. Please try again or type 'cancel' to skip.",
@@ -191,9 +252,15 @@ def input_url_for_video():
                         )
                     )
                 else:
-                    download_stream(url, format_id, download_path)
+                    jobs.append(download_queue.make_job(url, format_id, download_path, info=reusable))
                     break
 
+        if jobs:
+            print(colored(f"\nDownloading {len(jobs)} video(s), {download_queue.DOWNLOAD_WORKERS} at a time...", "yellow"))
+            download_queue.run_jobs(jobs)
+            done = sum(job["state"] == "done" for job in jobs)
+            print(colored(f"{done}/{len(jobs)} downloads complete!", "green" if done == len(jobs) else "yellow"))
+
         retry = (
             input(
                 colored("\nDo you want to download more videos? (yes/no): ", "yellow")
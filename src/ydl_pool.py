@@ -0,0 +1,68 @@
+"""
+Pool of reusable yt_dlp.YoutubeDL sessions shared by all modules.
+
+Creating a YoutubeDL object throws away extractor initialization, cookies,
+player-JS/signature caches and keep-alive connections. Borrowing a session
+from this pool keeps them for the next call with the same options.
+"""
+import atexit
+import threading
+from contextlib import contextmanager
+import yt_dlp
+
+# Idle sessions kept per option profile; extra ones are closed when returned
+MAX_IDLE_PER_PROFILE = 4
+
+_lock = threading.Lock()
+_idle = {}  # Option profile key -> list of idle YoutubeDL sessions
+
+
+def _freeze(value):
+    """Turns an options value into something hashable, for use as a profile key."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+@contextmanager
+def borrow(options):
+    """
+    Lends a YoutubeDL session configured with ``options``.
+
+    A session is only ever used by one borrower at a time, so worker threads
+    can borrow concurrently; each gets its own session for the same profile.
+
+    Args:
+        options (dict): yt-dlp options; equal options share sessions.
+
+    Yields:
+        yt_dlp.YoutubeDL: A ready-to-use session.
+    """
+    key = _freeze(options)
+    with _lock:
+        sessions = _idle.get(key)
+        ydl = sessions.pop() if sessions else None
+    if ydl is None:
+        ydl = yt_dlp.YoutubeDL(dict(options))
+    try:
+        yield ydl
+    finally:
+        with _lock:
+            sessions = _idle.setdefault(key, [])
+            if len(sessions) < MAX_IDLE_PER_PROFILE:
+                sessions.append(ydl)
+                ydl = None
+        if ydl is not None:
+            ydl.close()
+
+
+@atexit.register
+def close_all():
+    """Closes every idle session, flushing cookies and caches to disk."""
+    with _lock:
+        sessions = [ydl for pool in _idle.values() for ydl in pool]
+        _idle.clear()
+    for ydl in sessions:
+        ydl.close()